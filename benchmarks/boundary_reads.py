@@ -0,0 +1,95 @@
+"""Latency of GET /boundaries/{camera_ip} bodies: the validating path vs cached bytes, and rescaled ones.
+
+    python -m benchmarks.boundary_reads [--cameras N] [--iterations N]
+
+Runs against a throwaway JSON store in a temporary directory.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from events import EventBroker
+from models import GenericResponse
+from repository import Repository
+from responses import ResponseCache, orjson, dumps
+from services import MatchService, BoundaryService
+from validation_cache import ValidationCache
+from history import BoundaryHistory
+from homography import HomographyCache
+from zone_maps import ZoneMapCache
+
+
+def validated_body(boundary_service: BoundaryService, camera_ip: str) -> bytes:
+    # What FastAPI did for the route before: build the envelope, re-validate it
+    # against response_model, run jsonable_encoder and json.dumps
+    response = GenericResponse(success=True, data=boundary_service.get_boundaries(camera_ip))
+    validated = GenericResponse.model_validate(response.model_dump(by_alias=True))
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def cached_body(boundary_service: BoundaryService, camera_ip: str) -> bytes:
+    return boundary_service.get_boundaries_json(camera_ip, boundary_service.boundary_version(camera_ip))
+
+
+def rescaled_body(boundary_service: BoundaryService, camera_ip: str) -> bytes:
+    # GET /boundaries/{camera_ip}?width=1920&height=1080 without the cache
+    return dumps({"success": True, "data": boundary_service.get_boundaries(camera_ip, 1920, 1080), "status_code": 200})
+
+
+def scaled_body(boundary_service: BoundaryService, camera_ip: str) -> bytes:
+    return boundary_service.get_boundaries_json(camera_ip, boundary_service.boundary_version(camera_ip), 1920, 1080)
+
+
+def measure(read: Callable[[str], bytes], cameras: List[str], iterations: int) -> List[float]:
+    timings = []
+    for i in range(iterations):
+        camera_ip = cameras[i % len(cameras)]
+        start = time.perf_counter()
+        read(camera_ip)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def report(name: str, timings: List[float]):
+    percentiles = statistics.quantiles(timings, n=100)
+    print(f"{name:<10} mean {statistics.fmean(timings):8.1f} us   p50 {percentiles[49]:8.1f} us   "
+          f"p99 {percentiles[98]:8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cameras", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Repository(os.path.join(directory, "match.json"), os.path.join(directory, "boundary.json"))
+        storage.load()
+        events = EventBroker(0, 1)
+        responses = ResponseCache(2 * args.cameras + 1, 2 * args.cameras + 1)
+        match_service = MatchService(storage, events, responses)
+        boundary_service = BoundaryService(storage, ZoneMapCache(640, 480, 1), events, responses,
+                                           ValidationCache(1), BoundaryHistory(0, 1), HomographyCache(1))
+        cameras = [f"10.0.{i // 256}.{i % 256}" for i in range(args.cameras)]
+        with storage.transaction():
+            for i, camera_ip in enumerate(cameras):
+                match_service.create_match(f"T{i}", camera_ip, i % 6 + 1, boundary_service)
+
+        assert validated_body(boundary_service, cameras[0]) == cached_body(boundary_service, cameras[0])
+        print(f"{args.cameras} cameras, {args.iterations} reads, encoder: {'orjson' if orjson else 'json'}")
+        report("validated", measure(lambda camera_ip: validated_body(boundary_service, camera_ip), cameras, args.iterations))
+        # The first pass over the cameras fills the cache
+        report("cached", measure(lambda camera_ip: cached_body(boundary_service, camera_ip), cameras, args.iterations))
+        assert rescaled_body(boundary_service, cameras[0]) == scaled_body(boundary_service, cameras[0])
+        report("rescaled", measure(lambda camera_ip: rescaled_body(boundary_service, camera_ip), cameras, args.iterations))
+        report("scaled", measure(lambda camera_ip: scaled_body(boundary_service, camera_ip), cameras, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Startup time of the JSON store, parsing the files versus mapping the snapshot.
+
+    python -m benchmarks.cold_start --cameras 1000 10000 100000 [--repeat N]
+
+Seeds each fleet with the same synthetic layouts as benchmarks.http_load in
+a temporary directory, then times a fresh Repository loading it.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.http_load import seed
+from repository import Repository
+from snapshot import Snapshot
+
+
+def timed_load(make_repository, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        repository = make_repository()
+        start = time.perf_counter()
+        repository.load()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(cameras: int, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        match_file = os.path.join(directory, "match.json")
+        boundary_file = os.path.join(directory, "boundary.json")
+        snapshot = Snapshot(os.path.join(directory, "storage.snapshot"))
+
+        repository = Repository(match_file, boundary_file, snapshot=snapshot)
+        repository.load()
+        seed(repository, cameras, random.Random(1))
+        repository.close()
+
+        from_json = timed_load(lambda: Repository(match_file, boundary_file), repeat)
+        from_snapshot = timed_load(lambda: Repository(match_file, boundary_file, snapshot=snapshot), repeat)
+
+        loaded = Repository(match_file, boundary_file, snapshot=snapshot)
+        loaded.load()
+        if loaded.list_boundaries() != Repository(match_file, boundary_file).list_boundaries():
+            raise SystemExit("Snapshot and JSON files disagree")
+
+        json_size = os.path.getsize(match_file) + os.path.getsize(boundary_file)
+        print(f"{cameras:>9} cameras: json {from_json:7.3f} s ({json_size / 1e6:7.1f} MB), "
+              f"snapshot {from_snapshot:7.3f} s ({os.path.getsize(snapshot.path) / 1e6:7.1f} MB), "
+              f"{from_json / from_snapshot:4.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="loads per store, the fastest counts")
+    args = parser.parse_args()
+    for cameras in args.cameras:
+        run(cameras, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
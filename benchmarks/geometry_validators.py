@@ -0,0 +1,229 @@
+"""Micro-benchmark and regression check of the boundary validators.
+
+    python -m benchmarks.geometry_validators [--count N] [--output FILE] [--update-baseline]
+
+Times PolygonValidator, IntersectionValidator, OverlapValidator and
+classify_overlaps, at the table sizes the service checks, over a seeded
+corpus of convex, concave, self-intersecting and degenerate quads, and
+writes the results as JSON. Exits with status 1
+when an implementation's answers differ from the stored baseline or from
+the implementation it replaces, or when its throughput falls more than
+--tolerance below the baseline. Baseline throughput is machine specific:
+refresh it with --update-baseline when changing machines, and widen
+--tolerance on shared or noisy hosts.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from models import Coordinate, Quad
+from validators import IntersectionValidator, Overlap, OverlapValidator, PolygonValidator, classify_overlaps
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "geometry_validators_baseline.json")
+# A step change checks the new quad against the other items of its table, at most 7 of them
+GROUP_SIZE = 7
+# Table sizes classify_overlaps is timed at, one call per placement as in the service
+TABLE_SIZES = (2, 4, 8)
+
+Points = List[Tuple[int, int]]
+
+
+def make_quad(points: Points) -> Quad:
+    corners = [Coordinate(x=x, y=y) for x, y in points]
+    return Quad(UL_coord=corners[0], UR_coord=corners[1], LR_coord=corners[2], LL_coord=corners[3])
+
+
+def convex_points(rng: random.Random) -> Points:
+    # Four points on a circle in angular order
+    cx, cy, radius = rng.randint(0, 640), rng.randint(0, 480), rng.randint(5, 200)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(4))
+    return [(round(cx + radius * math.cos(a)), round(cy + radius * math.sin(a))) for a in angles]
+
+
+def concave_points(rng: random.Random) -> Points:
+    # Push one corner past the diagonal between its neighbours
+    p = convex_points(rng)
+    mx, my = (p[0][0] + p[2][0]) / 2, (p[0][1] + p[2][1]) / 2
+    t = rng.uniform(0.3, 0.9)
+    p[1] = (round(mx + (mx - p[1][0]) * t), round(my + (my - p[1][1]) * t))
+    return p
+
+
+def self_intersecting_points(rng: random.Random) -> Points:
+    p = convex_points(rng)
+    p[1], p[2] = p[2], p[1]
+    return p
+
+
+def degenerate_points(rng: random.Random) -> Points:
+    p = convex_points(rng)
+    kind = rng.randrange(3)
+    if kind == 0:
+        p[2] = p[1]                                       # duplicate corner
+    elif kind == 1:
+        x0, y0, dx, dy = p[0][0], p[0][1], rng.randint(-5, 5), rng.randint(-5, 5)
+        p = [(x0 + dx * i, y0 + dy * i) for i in range(4)]  # collinear
+    else:
+        p = [p[0]] * 4                                    # a single point
+    return p
+
+
+CATEGORIES: Dict[str, Callable[[random.Random], Points]] = {
+    "convex": convex_points,
+    "concave": concave_points,
+    "self_intersecting": self_intersecting_points,
+    "degenerate": degenerate_points,
+}
+
+
+def build_corpus(count: int, seed: int) -> Tuple[List[Quad], List[Tuple[Quad, List[Quad]]]]:
+    """`count` quads per category, and `count` placement groups of one candidate against GROUP_SIZE convex quads."""
+    rng = random.Random(seed)
+    quads = [make_quad(generate(rng)) for generate in CATEGORIES.values() for _ in range(count)]
+    groups = []
+    for _ in range(count):
+        candidate = make_quad(convex_points(rng))
+        groups.append((candidate, [make_quad(convex_points(rng)) for _ in range(GROUP_SIZE)]))
+    return quads, groups
+
+
+def digest(answers: Sequence) -> str:
+    return hashlib.sha256(json.dumps(list(answers)).encode()).hexdigest()[:16]
+
+
+def timed(run: Callable[[], list], operations: int, repeat: int) -> Tuple[float, list]:
+    # Like timeit, collections are kept out of the timed runs
+    best = math.inf
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            answers = run()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return operations / best, answers
+
+
+def run_benchmarks(quads: List[Quad], groups: List[Tuple[Quad, List[Quad]]], repeat: int) -> Dict[str, dict]:
+    pairs = [(candidate, other) for candidate, others in groups for other in others]
+
+    benchmarks = {
+        "polygon.is_valid_polygon": (len(quads), lambda: [PolygonValidator(q).is_valid_polygon()[0] for q in quads]),
+        "intersection.find_intersections": (
+            len(pairs), lambda: [bool(IntersectionValidator(a, b).find_intersections()) for a, b in pairs]),
+        "intersection.is_valid_placement": (
+            len(pairs), lambda: [IntersectionValidator(a, b).is_valid_placement()[0] for a, b in pairs]),
+        "overlap.classify": (len(pairs), lambda: [OverlapValidator(a, b).classify().value for a, b in pairs]),
+    }
+    for size in TABLE_SIZES:
+        benchmarks[f"overlap.classify_overlaps@{size}"] = (
+            len(groups) * (size - 1),
+            lambda size=size: [overlap.value for candidate, others in groups
+                               for overlap in classify_overlaps([(candidate, other) for other in others[:size - 1]])])
+    results = {}
+    for name, (operations, run) in benchmarks.items():
+        ops_per_sec, answers = timed(run, operations, repeat)
+        results[name] = {"operations": operations, "ops_per_sec": round(ops_per_sec), "digest": digest(answers),
+                         "answers": answers}
+    return results
+
+
+def consistency_errors(results: Dict[str, dict], groups: List[Tuple[Quad, List[Quad]]]) -> List[str]:
+    """Disagreements between implementations of the same check over the corpus."""
+    errors = []
+    crossings = results["intersection.find_intersections"]["answers"]
+    placements = results["intersection.is_valid_placement"]["answers"]
+    if [not crossing for crossing in crossings] != placements:
+        errors.append("IntersectionValidator.is_valid_placement disagrees with find_intersections")
+
+    # Like the service, the separating-axis engines assume both quads passed PolygonValidator
+    valid = [PolygonValidator(quad).is_valid_polygon()[0] for candidate, others in groups for quad in [candidate] + others]
+    convex = [valid[g * (GROUP_SIZE + 1)] and valid[g * (GROUP_SIZE + 1) + 1 + i]
+              for g in range(len(groups)) for i in range(GROUP_SIZE)]
+    batched = results[f"overlap.classify_overlaps@{GROUP_SIZE + 1}"]["answers"]
+    for index, (overlap, expected) in enumerate(zip(batched, results["overlap.classify"]["answers"])):
+        if convex[index] and overlap != expected:
+            errors.append(f"pair {index}: classify_overlaps says {overlap}, OverlapValidator says {expected}")
+
+    # OverlapValidator also reports containment, so it only has to agree with
+    # IntersectionValidator where edge crossings decide the answer
+    for index, (overlap, crossing) in enumerate(zip(results["overlap.classify"]["answers"], crossings)):
+        if not convex[index]:
+            continue
+        if overlap == Overlap.SEPARATE.value and crossing:
+            errors.append(f"pair {index}: OverlapValidator says SEPARATE but edges cross")
+        elif overlap in (Overlap.TOUCHING.value, Overlap.OVERLAPPING.value) and not crossing:
+            errors.append(f"pair {index}: OverlapValidator says {overlap} but no edges cross")
+    return errors[:20]
+
+
+def regressions(results: Dict[str, dict], baseline: dict, tolerance: float) -> List[str]:
+    messages = []
+    for name, result in results.items():
+        expected = baseline.get("results", {}).get(name)
+        if not expected:
+            continue
+        if result["digest"] != expected["digest"]:
+            messages.append(f"{name}: answers changed (digest {result['digest']}, baseline {expected['digest']})")
+        floor = expected["ops_per_sec"] * (1 - tolerance)
+        if result["ops_per_sec"] < floor:
+            messages.append(f"{name}: {result['ops_per_sec']} ops/s is below {floor:.0f} "
+                            f"({expected['ops_per_sec']} ops/s baseline - {tolerance:.0%})")
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="quads per category and placement groups")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark, the fastest counts")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop below the baseline")
+    parser.add_argument("--output", default="geometry_validators.json")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    quads, groups = build_corpus(args.count, args.seed)
+    results = run_benchmarks(quads, groups, args.repeat)
+    errors = consistency_errors(results, groups)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    same_corpus = baseline.get("count") == args.count and baseline.get("seed") == args.seed
+    compare = same_corpus and not args.update_baseline
+    failures = errors + (regressions(results, baseline, args.tolerance) if compare else [])
+
+    summary = {
+        "count": args.count,
+        "seed": args.seed,
+        "results": {name: {key: value for key, value in result.items() if key != "answers"}
+                    for name, result in results.items()},
+    }
+    with open(args.output, "w") as f:
+        json.dump({**summary, "failures": failures}, f, indent=2)
+    if args.update_baseline and not errors:
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    for name, result in summary["results"].items():
+        print(f"{name:<34}{result['ops_per_sec']:>12} ops/s   {result['digest']}")
+    if baseline and not same_corpus and not args.update_baseline:
+        print("Baseline was recorded for another --count/--seed, throughput and answers not compared")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""HTTP load test of the API against a synthetic camera fleet.
+
+    python -m benchmarks.http_load --cameras 1000 10000 100000 [--backend json|journal|sqlite]
+                                   [--requests N] [--concurrency N] [--mix get=80,step=15,create=3,delete=2]
+
+Each fleet size runs in its own process, against a store seeded in a
+temporary directory, through an in-process ASGI client (needs httpx), so
+the numbers cover the app and storage but no network. Every worker owns a
+disjoint slice of the cameras, so it knows each camera's step and its
+change_step requests are valid moves.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+OPERATIONS = ("get", "step", "create", "delete")
+
+OUTER = (0, 0, 640, 480)
+TABLE = (200, 150, 440, 330)
+
+
+def quad(x0: int, y0: int, x1: int, y1: int) -> dict:
+    return {
+        "UL_coord": {"x": x0, "y": y0}, "UR_coord": {"x": x1, "y": y0},
+        "LR_coord": {"x": x1, "y": y1}, "LL_coord": {"x": x0, "y": y1}
+    }
+
+
+def seat(capacity: int, number: int) -> Tuple[int, int, int, int]:
+    # Seats side by side along the bottom of the frame, inside OUTER and clear of each other
+    width = 600 // capacity
+    x0 = 20 + (number - 1) * width
+    return x0 + 2, 340, x0 + width - 2, 470
+
+
+def layout(capacity: int) -> List[dict]:
+    items = [{"boundary_type": "OUTER", **quad(*OUTER)}, {"boundary_type": "TABLE", **quad(*TABLE)}]
+    items += [{"boundary_type": str(n), **quad(*seat(capacity, n))} for n in range(1, capacity + 1)]
+    return items
+
+
+def step_quad(capacity: int, step: str) -> dict:
+    if step == "OUTER":
+        return quad(*OUTER)
+    if step == "TABLE":
+        return quad(*TABLE)
+    return quad(*seat(capacity, int(step)))
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {name: 0 for name in OPERATIONS}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in weights:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        weights[name] = int(weight)
+    return weights
+
+
+def seed(storage, cameras: int, rng: random.Random) -> Dict[str, Tuple[int, str]]:
+    from models import MatchTable, BoundaryTable
+    from utils import get_step_order_for_capacity
+
+    fleet = {}
+    with storage.transaction():
+        for i in range(cameras):
+            camera_ip = f"10.{i // 65536}.{i // 256 % 256}.{i % 256}"
+            capacity = rng.randint(1, 6)
+            step = rng.choice(get_step_order_for_capacity(capacity)).value
+            storage.save_match(MatchTable(table_id=f"T{i}", camera_ip=camera_ip, step=step, capacity=capacity))
+            storage.save_boundary(BoundaryTable(table_id=f"T{i}", camera_ip=camera_ip, items=layout(capacity)))
+            fleet[camera_ip] = (capacity, step)
+    return fleet
+
+
+class Worker:
+    def __init__(self, index: int, client, fleet: Dict[str, Tuple[int, str]], weights: Dict[str, int], seed: int):
+        self.index = index
+        self.client = client
+        self.fleet = fleet
+        self.cameras = list(fleet)
+        self.rng = random.Random(seed)
+        self.operations = [name for name in OPERATIONS if weights[name]]
+        self.weights = [weights[name] for name in self.operations]
+        self.created = 0
+        self.timings: Dict[str, List[float]] = {name: [] for name in OPERATIONS}
+        self.errors: Dict[str, int] = {name: 0 for name in OPERATIONS}
+
+    async def run(self, requests: int):
+        for _ in range(requests):
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            if operation == "delete" and len(self.cameras) < 2:
+                operation = "create"
+            start = time.perf_counter()
+            ok = await getattr(self, operation)()
+            self.timings[operation].append(time.perf_counter() - start)
+            if not ok:
+                self.errors[operation] += 1
+
+    @staticmethod
+    def succeeded(response) -> bool:
+        return response.status_code < 400 and response.json().get("success", False)
+
+    async def get(self) -> bool:
+        response = await self.client.get(f"/boundaries/{self.rng.choice(self.cameras)}")
+        return self.succeeded(response)
+
+    async def step(self) -> bool:
+        camera_ip = self.rng.choice(self.cameras)
+        capacity, step = self.fleet[camera_ip]
+        direction = "previous" if step == "FINAL" else "next"
+        coordinates = step_quad(capacity, "OUTER" if step == "FINAL" else step)
+        response = await self.client.put("/matches/change_step", json={
+            "direction": direction, "camera_ip": camera_ip, **coordinates
+        })
+        ok = self.succeeded(response)
+        if ok:
+            self.fleet[camera_ip] = (capacity, response.json()["data"]["updated_match"]["step"])
+        return ok
+
+    async def create(self) -> bool:
+        self.created += 1
+        camera_ip = f"new-{self.index}-{self.created}"
+        capacity = self.rng.randint(1, 6)
+        response = await self.client.post("/matches", params={
+            "table_id": f"new-{self.index}-{self.created}", "camera_ip": camera_ip, "capacity": capacity
+        })
+        ok = self.succeeded(response)
+        if ok:
+            self.fleet[camera_ip] = (capacity, "OUTER")
+            self.cameras.append(camera_ip)
+        return ok
+
+    async def delete(self) -> bool:
+        camera_ip = self.cameras.pop(self.rng.randrange(len(self.cameras)))
+        self.fleet.pop(camera_ip)
+        response = await self.client.delete("/matches", params={"camera_ip": camera_ip})
+        return self.succeeded(response)
+
+
+def percentile(values: List[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def report(workers: List[Worker], elapsed: float):
+    print(f"{'operation':<10}{'count':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    total = 0
+    for operation in OPERATIONS:
+        timings = [t * 1000 for worker in workers for t in worker.timings[operation]]
+        if not timings:
+            continue
+        total += len(timings)
+        errors = sum(worker.errors[operation] for worker in workers)
+        print(f"{operation:<10}{len(timings):>9}{errors:>8}{percentile(timings, 50):>10.2f}"
+              f"{percentile(timings, 95):>10.2f}{percentile(timings, 99):>10.2f}")
+    print(f"{total} requests in {elapsed:.2f} s: {total / elapsed:.0f} req/s")
+
+
+async def run_fleet(args: argparse.Namespace, cameras: int):
+    import httpx
+    import main
+    from dependencies import get_storage, create_storage
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    fleet = seed(get_storage(), cameras, rng)
+    seeded = time.perf_counter() - start
+
+    # Cold load of the seeded store by a second instance, as after a restart. It is not
+    # closed: for the journal backend that would compact the files under the app's storage.
+    start = time.perf_counter()
+    create_storage().load()
+    loaded = time.perf_counter() - start
+    print(f"backend {args.backend}, {cameras} cameras: seeded in {seeded:.2f} s, loaded in {loaded:.2f} s")
+
+    async with main.lifespan(main.app):
+        names = list(fleet)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            workers = [
+                Worker(i, client, {name: fleet[name] for name in names[i::args.concurrency]}, args.mix, args.seed + i)
+                for i in range(args.concurrency)
+            ]
+            per_worker = max(1, args.requests // args.concurrency)
+            start = time.perf_counter()
+            await asyncio.gather(*(worker.run(per_worker) for worker in workers))
+            elapsed = time.perf_counter() - start
+    report(workers, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1000])
+    parser.add_argument("--backend", choices=("json", "journal", "sqlite"), default="json")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default="get=80,step=15,create=3,delete=2")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if len(args.cameras) > 1:
+        # One process per fleet size: the app and its storage are module-level singletons
+        mix = ",".join(f"{name}={weight}" for name, weight in args.mix.items())
+        for cameras in args.cameras:
+            subprocess.run([
+                sys.executable, "-m", "benchmarks.http_load", "--cameras", str(cameras), "--backend", args.backend,
+                "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--mix", mix,
+                "--seed", str(args.seed)
+            ], check=True)
+            print()
+        return
+
+    root = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # The store paths in config.py are relative to the working directory
+        os.chdir(directory)
+        sys.path.insert(0, root)
+        os.environ["STORAGE_BACKEND"] = args.backend
+        os.environ.setdefault("BOUNDARY_API_VERSION", "benchmark")
+        try:
+            asyncio.run(run_fleet(args, args.cameras[0]))
+        finally:
+            os.chdir(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from typing import AsyncIterator, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+
+from models import BulkMatch
+
+# Cap on the per-line errors returned for a rejected import
+MAX_REPORTED_ERRORS = 100
+
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Numbered lines of a streamed body, without holding more than one partial line."""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+    if buffer:
+        yield line_number + 1, buffer
+
+
+async def parse_matches(chunks: AsyncIterator[bytes]) -> Tuple[List[Tuple[int, BulkMatch]], List[dict]]:
+    """Parses an NDJSON body of BulkMatch records, skipping blank lines.
+
+    Returns the (line number, record) pairs and the errors of the lines that
+    failed to parse.
+    """
+    records, errors = [], []
+    async for line_number, line in read_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            records.append((line_number, BulkMatch.model_validate_json(line)))
+        except ValidationError as e:
+            errors.append({"line": line_number, "detail": describe_validation_error(e)})
+    return records, errors
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc']))}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+
+def dump_matches(records: Iterable[BulkMatch]) -> Iterator[bytes]:
+    for record in records:
+        yield record.model_dump_json().encode() + b"\n"
@@ -8,8 +8,77 @@ load_dotenv()
 
 
 BOUNDARY_API_VERSION = os.environ.get("BOUNDARY_API_VERSION")
-MATCH_DB_FILE = "./match.json"
-BOUNDARY_DB_FILE = "./boundary.json"
+# JSON files of the json/journal store; keep them in a mounted directory rather than
+# bind-mounting the files themselves, which cannot be atomically replaced
+MATCH_DB_FILE = os.environ.get("MATCH_DB_FILE", "./match.json")
+BOUNDARY_DB_FILE = os.environ.get("BOUNDARY_DB_FILE", "./boundary.json")
+# Seconds between mtime checks of the JSON files for external edits
+STORE_RECHECK_INTERVAL = float(os.environ.get("STORE_RECHECK_INTERVAL", "1.0"))
+
+# Storage settings: "json" rewrites the JSON files on every mutation,
+# "journal" appends mutations to JOURNAL_FILE and periodically compacts it,
+# "sqlite" keeps everything in SQLITE_DB_FILE (see migrate.py)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+SQLITE_DB_FILE = os.environ.get("SQLITE_DB_FILE", "./boundary.db")
+JOURNAL_FILE = os.environ.get("JOURNAL_FILE", "./storage.journal")
+JOURNAL_COMPACT_RECORDS = int(os.environ.get("JOURNAL_COMPACT_RECORDS", "1000"))
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get("JOURNAL_COMPACT_INTERVAL", "30"))
+
+# Binary snapshot of the json/journal store for fast restarts, written on shutdown and
+# every SNAPSHOT_INTERVAL seconds (0 disables the periodic write, an empty SNAPSHOT_FILE both)
+SNAPSHOT_FILE = os.environ.get("SNAPSHOT_FILE", "./storage.snapshot")
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", "300"))
+
+# Number of uvicorn worker processes. With more than one, the JSON store is
+# guarded by an flock on STORE_LOCK_FILE, which must be local to the container.
+WORKERS = int(os.environ.get("WORKERS", "1"))
+STORE_LOCK_FILE = os.environ.get("STORE_LOCK_FILE", "./storage.lock")
+
+# Threads running blocking storage calls for the async endpoints
+STORAGE_THREADS = int(os.environ.get("STORAGE_THREADS", "8"))
+
+# Frame size, in pixels, of the built-in default layouts and of boundary tables stored without one;
+# GET /boundaries/{camera_ip}?width=&height= rescales from a table's frame to any other resolution
+FRAME_WIDTH = int(os.environ.get("FRAME_WIDTH", "640"))
+FRAME_HEIGHT = int(os.environ.get("FRAME_HEIGHT", "480"))
+
+# Zone label maps: stream resolution they are rasterized at and how many are kept
+ZONE_MAP_WIDTH = int(os.environ.get("ZONE_MAP_WIDTH", "640"))
+ZONE_MAP_HEIGHT = int(os.environ.get("ZONE_MAP_HEIGHT", "480"))
+ZONE_MAP_CACHE_SIZE = int(os.environ.get("ZONE_MAP_CACHE_SIZE", "256"))
+
+# Frames buffered per classification WebSocket before the oldest is dropped
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "4"))
+
+# Minimum share of the smaller of a person box and a seat that must overlap
+# for the person to count as sitting there
+OCCUPANCY_OVERLAP_THRESHOLD = float(os.environ.get("OCCUPANCY_OVERLAP_THRESHOLD", "0.3"))
+
+# Change feed: events kept for resuming clients, per-subscriber backlog and keep-alive period (seconds)
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", "1000"))
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+EVENT_KEEPALIVE_INTERVAL = float(os.environ.get("EVENT_KEEPALIVE_INTERVAL", "15"))
+
+# Serialized GET /boundaries/{camera_ip} bodies kept in memory
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1024"))
+# ETags of those bodies kept by version, answering If-None-Match once a body is evicted
+ETAG_CACHE_SIZE = int(os.environ.get("ETAG_CACHE_SIZE", "65536"))
+
+# Boundary history: versions kept per camera (0 disables it), versions between full
+# copies of a layout, and the log it is kept in across restarts (empty keeps it in
+# memory). It is per process, so it is only kept with a single worker
+HISTORY_RETENTION = int(os.environ.get("HISTORY_RETENTION", "50"))
+HISTORY_KEYFRAME_INTERVAL = int(os.environ.get("HISTORY_KEYFRAME_INTERVAL", "10"))
+HISTORY_FILE = os.environ.get("HISTORY_FILE", "./history.journal")
+
+# Results of POST /boundaries/{camera_ip}/validate kept in memory
+VALIDATION_CACHE_SIZE = int(os.environ.get("VALIDATION_CACHE_SIZE", "4096"))
+
+# Cameras whose homography and its inverse are kept in memory for POST /boundaries/{camera_ip}/transform
+HOMOGRAPHY_CACHE_SIZE = int(os.environ.get("HOMOGRAPHY_CACHE_SIZE", "1024"))
+
+# Optional JSON file overriding DEFAULT_BOUNDARY_COORDINATES for some or all capacities (see layouts.py)
+DEFAULT_LAYOUT_FILE = os.environ.get("DEFAULT_LAYOUT_FILE")
 
 # Logging settings
 logging_config = {
@@ -68,158 +137,161 @@ def setup_logging():
 
 
 
+# Built-in default layout per capacity; TABLE and seats start off-frame until calibrated
+DEFAULT_BOUNDARY_COORDINATES: Dict[int, Dict[str, Dict[str, Dict[str, int]]]] = {
+    1: {
+        "OUTER": {
+            "UL": {"x": 40, "y": 40}, "UR": {"x": 600, "y": 40},
+            "LR": {"x": 600, "y": 440}, "LL": {"x": 40, "y": 440}
+        },
+        "TABLE": {
+            "UL": {"x": -560, "y": -400}, "UR": {"x": -80, "y": -400},
+            "LR": {"x": -80, "y": -80}, "LL": {"x": -560, "y": -80}
+        },
+        "1": {
+            "UL": {"x": -520, "y": -360}, "UR": {"x": -120, "y": -360},
+            "LR": {"x": -120, "y": -120}, "LL": {"x": -520, "y": -120}
+        },
+    },
+    2: {
+        "OUTER": {
+            "UL": {"x": 30, "y": 30}, "UR": {"x": 610, "y": 30},
+            "LR": {"x": 610, "y": 450}, "LL": {"x": 30, "y": 450}
+        },
+        "TABLE": {
+            "UL": {"x": -570, "y": -410}, "UR": {"x": -70, "y": -410},
+            "LR": {"x": -70, "y": -70}, "LL": {"x": -570, "y": -70}
+        },
+        "1": {
+            "UL": {"x": -320, "y": -370}, "UR": {"x": -110, "y": -370},
+            "LR": {"x": -110, "y": -110}, "LL": {"x": -320, "y": -110}
+        },
+        "2": {
+            "UL": {"x": -530, "y": -370}, "UR": {"x": -320, "y": -370},
+            "LR": {"x": -320, "y": -110}, "LL": {"x": -530, "y": -110}
+        },
+    },
+    3: {
+        "OUTER": {
+            "UL": {"x": 20, "y": 20}, "UR": {"x": 620, "y": 20},
+            "LR": {"x": 620, "y": 460}, "LL": {"x": 20, "y": 460}
+        },
+        "TABLE": {
+            "UL": {"x": -580, "y": -420}, "UR": {"x": -60, "y": -420},
+            "LR": {"x": -60, "y": -60}, "LL": {"x": -580, "y": -60}
+        },
+        "1": {
+            "UL": {"x": -280, "y": -380}, "UR": {"x": -100, "y": -380},
+            "LR": {"x": -100, "y": -100}, "LL": {"x": -280, "y": -100}
+        },
+        "2": {
+            "UL": {"x": -460, "y": -380}, "UR": {"x": -280, "y": -380},
+            "LR": {"x": -280, "y": -100}, "LL": {"x": -460, "y": -100}
+        },
+        "3": {
+            "UL": {"x": -540, "y": -380}, "UR": {"x": -460, "y": -380},
+            "LR": {"x": -460, "y": -100}, "LL": {"x": -540, "y": -100}
+        },
+    },
+    4: {
+        "OUTER": {
+            "UL": {"x": 10, "y": 10}, "UR": {"x": 630, "y": 10},
+            "LR": {"x": 630, "y": 470}, "LL": {"x": 10, "y": 470}
+        },
+        "TABLE": {
+            "UL": {"x": -590, "y": -430}, "UR": {"x": -50, "y": -430},
+            "LR": {"x": -50, "y": -50}, "LL": {"x": -590, "y": -50}
+        },
+        "1": {
+            "UL": {"x": -250, "y": -230}, "UR": {"x": -90, "y": -230},
+            "LR": {"x": -90, "y": -90}, "LL": {"x": -250, "y": -90}
+        },
+        "2": {
+            "UL": {"x": -410, "y": -230}, "UR": {"x": -250, "y": -230},
+            "LR": {"x": -250, "y": -90}, "LL": {"x": -410, "y": -90}
+        },
+        "3": {
+            "UL": {"x": -250, "y": -390}, "UR": {"x": -90, "y": -390},
+            "LR": {"x": -90, "y": -230}, "LL": {"x": -250, "y": -230}
+        },
+        "4": {
+            "UL": {"x": -410, "y": -390}, "UR": {"x": -250, "y": -390},
+            "LR": {"x": -250, "y": -230}, "LL": {"x": -410, "y": -230}
+        },
+    },
+    5: {
+        "OUTER": {
+            "UL": {"x": 5, "y": 5}, "UR": {"x": 635, "y": 5},
+            "LR": {"x": 635, "y": 475}, "LL": {"x": 5, "y": 475}
+        },
+        "TABLE": {
+            "UL": {"x": -595, "y": -435}, "UR": {"x": -45, "y": -435},
+            "LR": {"x": -45, "y": -45}, "LL": {"x": -595, "y": -45}
+        },
+        "1": {
+            "UL": {"x": -225, "y": -205}, "UR": {"x": -85, "y": -205},
+            "LR": {"x": -85, "y": -85}, "LL": {"x": -225, "y": -85}
+        },
+        "2": {
+            "UL": {"x": -365, "y": -205}, "UR": {"x": -225, "y": -205},
+            "LR": {"x": -225, "y": -85}, "LL": {"x": -365, "y": -85}
+        },
+        "3": {
+            "UL": {"x": -505, "y": -205}, "UR": {"x": -365, "y": -205},
+            "LR": {"x": -365, "y": -85}, "LL": {"x": -505, "y": -85}
+        },
+        "4": {
+            "UL": {"x": -295, "y": -395}, "UR": {"x": -85, "y": -395},
+            "LR": {"x": -85, "y": -205}, "LL": {"x": -295, "y": -205}
+        },
+        "5": {
+            "UL": {"x": -505, "y": -395}, "UR": {"x": -295, "y": -395},
+            "LR": {"x": -295, "y": -205}, "LL": {"x": -505, "y": -205}
+        },
+    },
+    6: {
+        "OUTER": {
+            "UL": {"x": 0, "y": 0}, "UR": {"x": 640, "y": 0},
+            "LR": {"x": 640, "y": 480}, "LL": {"x": 0, "y": 480}
+        },
+        "TABLE": {
+            "UL": {"x": -600, "y": -440}, "UR": {"x": -40, "y": -440},
+            "LR": {"x": -40, "y": -40}, "LL": {"x": -600, "y": -40}
+        },
+        "1": {
+            "UL": {"x": -200, "y": -180}, "UR": {"x": -80, "y": -180},
+            "LR": {"x": -80, "y": -80}, "LL": {"x": -200, "y": -80}
+        },
+        "2": {
+            "UL": {"x": -320, "y": -180}, "UR": {"x": -200, "y": -180},
+            "LR": {"x": -200, "y": -80}, "LL": {"x": -320, "y": -80}
+        },
+        "3": {
+            "UL": {"x": -440, "y": -180}, "UR": {"x": -320, "y": -180},
+            "LR": {"x": -320, "y": -80}, "LL": {"x": -440, "y": -80}
+        },
+        "4": {
+            "UL": {"x": -200, "y": -400}, "UR": {"x": -80, "y": -400},
+            "LR": {"x": -80, "y": -180}, "LL": {"x": -200, "y": -180}
+        },
+        "5": {
+            "UL": {"x": -320, "y": -400}, "UR": {"x": -200, "y": -400},
+            "LR": {"x": -200, "y": -180}, "LL": {"x": -320, "y": -180}
+        },
+        "6": {
+            "UL": {"x": -440, "y": -400}, "UR": {"x": -320, "y": -400},
+            "LR": {"x": -320, "y": -180}, "LL": {"x": -440, "y": -180}
+        },
+    },
+}
+
+
 class DefaultBoundaryCoordinates:
     @staticmethod
     def get_default_coordinates(boundary_type: str, capacity: int) -> Dict[str, Dict[str, int]]:
-        capacity_coordinates = {
-            1: {
-                "OUTER": {
-                    "UL": {"x": 40, "y": 40}, "UR": {"x": 600, "y": 40},
-                    "LR": {"x": 600, "y": 440}, "LL": {"x": 40, "y": 440}
-                },
-                "TABLE": {
-                    "UL": {"x": -560, "y": -400}, "UR": {"x": -80, "y": -400},
-                    "LR": {"x": -80, "y": -80}, "LL": {"x": -560, "y": -80}
-                },
-                "1": {
-                    "UL": {"x": -520, "y": -360}, "UR": {"x": -120, "y": -360},
-                    "LR": {"x": -120, "y": -120}, "LL": {"x": -520, "y": -120}
-                },
-            },
-            2: {
-                "OUTER": {
-                    "UL": {"x": 30, "y": 30}, "UR": {"x": 610, "y": 30},
-                    "LR": {"x": 610, "y": 450}, "LL": {"x": 30, "y": 450}
-                },
-                "TABLE": {
-                    "UL": {"x": -570, "y": -410}, "UR": {"x": -70, "y": -410},
-                    "LR": {"x": -70, "y": -70}, "LL": {"x": -570, "y": -70}
-                },
-                "1": {
-                    "UL": {"x": -320, "y": -370}, "UR": {"x": -110, "y": -370},
-                    "LR": {"x": -110, "y": -110}, "LL": {"x": -320, "y": -110}
-                },
-                "2": {
-                    "UL": {"x": -530, "y": -370}, "UR": {"x": -320, "y": -370},
-                    "LR": {"x": -320, "y": -110}, "LL": {"x": -530, "y": -110}
-                },
-            },
-            3: {
-                "OUTER": {
-                    "UL": {"x": 20, "y": 20}, "UR": {"x": 620, "y": 20},
-                    "LR": {"x": 620, "y": 460}, "LL": {"x": 20, "y": 460}
-                },
-                "TABLE": {
-                    "UL": {"x": -580, "y": -420}, "UR": {"x": -60, "y": -420},
-                    "LR": {"x": -60, "y": -60}, "LL": {"x": -580, "y": -60}
-                },
-                "1": {
-                    "UL": {"x": -280, "y": -380}, "UR": {"x": -100, "y": -380},
-                    "LR": {"x": -100, "y": -100}, "LL": {"x": -280, "y": -100}
-                },
-                "2": {
-                    "UL": {"x": -460, "y": -380}, "UR": {"x": -280, "y": -380},
-                    "LR": {"x": -280, "y": -100}, "LL": {"x": -460, "y": -100}
-                },
-                "3": {
-                    "UL": {"x": -540, "y": -380}, "UR": {"x": -460, "y": -380},
-                    "LR": {"x": -460, "y": -100}, "LL": {"x": -540, "y": -100}
-                },
-            },
-            4: {
-                "OUTER": {
-                    "UL": {"x": 10, "y": 10}, "UR": {"x": 630, "y": 10},
-                    "LR": {"x": 630, "y": 470}, "LL": {"x": 10, "y": 470}
-                },
-                "TABLE": {
-                    "UL": {"x": -590, "y": -430}, "UR": {"x": -50, "y": -430},
-                    "LR": {"x": -50, "y": -50}, "LL": {"x": -590, "y": -50}
-                },
-                "1": {
-                    "UL": {"x": -250, "y": -230}, "UR": {"x": -90, "y": -230},
-                    "LR": {"x": -90, "y": -90}, "LL": {"x": -250, "y": -90}
-                },
-                "2": {
-                    "UL": {"x": -410, "y": -230}, "UR": {"x": -250, "y": -230},
-                    "LR": {"x": -250, "y": -90}, "LL": {"x": -410, "y": -90}
-                },
-                "3": {
-                    "UL": {"x": -250, "y": -390}, "UR": {"x": -90, "y": -390},
-                    "LR": {"x": -90, "y": -230}, "LL": {"x": -250, "y": -230}
-                },
-                "4": {
-                    "UL": {"x": -410, "y": -390}, "UR": {"x": -250, "y": -390},
-                    "LR": {"x": -250, "y": -230}, "LL": {"x": -410, "y": -230}
-                },
-            },
-            5: {
-                "OUTER": {
-                    "UL": {"x": 5, "y": 5}, "UR": {"x": 635, "y": 5},
-                    "LR": {"x": 635, "y": 475}, "LL": {"x": 5, "y": 475}
-                },
-                "TABLE": {
-                    "UL": {"x": -595, "y": -435}, "UR": {"x": -45, "y": -435},
-                    "LR": {"x": -45, "y": -45}, "LL": {"x": -595, "y": -45}
-                },
-                "1": {
-                    "UL": {"x": -225, "y": -205}, "UR": {"x": -85, "y": -205},
-                    "LR": {"x": -85, "y": -85}, "LL": {"x": -225, "y": -85}
-                },
-                "2": {
-                    "UL": {"x": -365, "y": -205}, "UR": {"x": -225, "y": -205},
-                    "LR": {"x": -225, "y": -85}, "LL": {"x": -365, "y": -85}
-                },
-                "3": {
-                    "UL": {"x": -505, "y": -205}, "UR": {"x": -365, "y": -205},
-                    "LR": {"x": -365, "y": -85}, "LL": {"x": -505, "y": -85}
-                },
-                "4": {
-                    "UL": {"x": -295, "y": -395}, "UR": {"x": -85, "y": -395},
-                    "LR": {"x": -85, "y": -205}, "LL": {"x": -295, "y": -205}
-                },
-                "5": {
-                    "UL": {"x": -505, "y": -395}, "UR": {"x": -295, "y": -395},
-                    "LR": {"x": -295, "y": -205}, "LL": {"x": -505, "y": -205}
-                },
-            },
-            6: {
-                "OUTER": {
-                    "UL": {"x": 0, "y": 0}, "UR": {"x": 640, "y": 0},
-                    "LR": {"x": 640, "y": 480}, "LL": {"x": 0, "y": 480}
-                },
-                "TABLE": {
-                    "UL": {"x": -600, "y": -440}, "UR": {"x": -40, "y": -440},
-                    "LR": {"x": -40, "y": -40}, "LL": {"x": -600, "y": -40}
-                },
-                "1": {
-                    "UL": {"x": -200, "y": -180}, "UR": {"x": -80, "y": -180},
-                    "LR": {"x": -80, "y": -80}, "LL": {"x": -200, "y": -80}
-                },
-                "2": {
-                    "UL": {"x": -320, "y": -180}, "UR": {"x": -200, "y": -180},
-                    "LR": {"x": -200, "y": -80}, "LL": {"x": -320, "y": -80}
-                },
-                "3": {
-                    "UL": {"x": -440, "y": -180}, "UR": {"x": -320, "y": -180},
-                    "LR": {"x": -320, "y": -80}, "LL": {"x": -440, "y": -80}
-                },
-                "4": {
-                    "UL": {"x": -200, "y": -400}, "UR": {"x": -80, "y": -400},
-                    "LR": {"x": -80, "y": -180}, "LL": {"x": -200, "y": -180}
-                },
-                "5": {
-                    "UL": {"x": -320, "y": -400}, "UR": {"x": -200, "y": -400},
-                    "LR": {"x": -200, "y": -180}, "LL": {"x": -320, "y": -180}
-                },
-                "6": {
-                    "UL": {"x": -440, "y": -400}, "UR": {"x": -320, "y": -400},
-                    "LR": {"x": -320, "y": -180}, "LL": {"x": -440, "y": -180}
-                },
-            },
-        }
-        
-        if capacity in capacity_coordinates and boundary_type in capacity_coordinates[capacity]:
-            return capacity_coordinates[capacity][boundary_type]
+        coordinates = DEFAULT_BOUNDARY_COORDINATES.get(capacity, {}).get(boundary_type)
+        if coordinates:
+            return {corner: dict(point) for corner, point in coordinates.items()}
         
         # Fallback to (0, 0) coordinates if no match is found
         return {
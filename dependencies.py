@@ -1,8 +1,84 @@
 from fastapi import Depends
 from services import MatchService, BoundaryService
+from storage import Storage
+from repository import Repository
+from sqlite_storage import SqliteStorage
+from journal import Journal
+from snapshot import Snapshot
+from zone_maps import ZoneMapCache
+from events import EventBroker
+from responses import ResponseCache
+from validation_cache import ValidationCache
+from history import BoundaryHistory
+from homography import HomographyCache
+from executor import StorageExecutor
+from config import (
+    MATCH_DB_FILE, BOUNDARY_DB_FILE, STORAGE_BACKEND, JOURNAL_FILE, SQLITE_DB_FILE, WORKERS, STORE_LOCK_FILE,
+    ZONE_MAP_WIDTH, ZONE_MAP_HEIGHT, ZONE_MAP_CACHE_SIZE, EVENT_BUFFER_SIZE, EVENT_QUEUE_SIZE,
+    RESPONSE_CACHE_SIZE, ETAG_CACHE_SIZE, STORAGE_THREADS, SNAPSHOT_FILE, VALIDATION_CACHE_SIZE,
+    HISTORY_RETENTION, HISTORY_KEYFRAME_INTERVAL, HISTORY_FILE, HOMOGRAPHY_CACHE_SIZE
+)
 
-def get_match_service() -> MatchService:
-    return MatchService()
+def create_storage() -> Storage:
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_DB_FILE)
+    journal = Journal(JOURNAL_FILE) if STORAGE_BACKEND == "journal" else None
+    lock_file = STORE_LOCK_FILE if WORKERS > 1 else None
+    snapshot = Snapshot(SNAPSHOT_FILE) if SNAPSHOT_FILE else None
+    return Repository(MATCH_DB_FILE, BOUNDARY_DB_FILE, journal=journal, lock_file=lock_file, snapshot=snapshot)
 
-def get_boundary_service() -> BoundaryService:
-    return BoundaryService()
\ No newline at end of file
+storage = create_storage()
+zone_maps = ZoneMapCache(ZONE_MAP_WIDTH, ZONE_MAP_HEIGHT, ZONE_MAP_CACHE_SIZE)
+events = EventBroker(EVENT_BUFFER_SIZE, EVENT_QUEUE_SIZE)
+responses = ResponseCache(RESPONSE_CACHE_SIZE, ETAG_CACHE_SIZE)
+validations = ValidationCache(VALIDATION_CACHE_SIZE)
+# Each worker would only see its own versions and rewrite the others' log, so the
+# history is only kept with one; the history routes answer 503 otherwise
+history = BoundaryHistory(
+    HISTORY_RETENTION if WORKERS == 1 else 0, HISTORY_KEYFRAME_INTERVAL,
+    Journal(HISTORY_FILE) if HISTORY_FILE and WORKERS == 1 else None
+)
+homographies = HomographyCache(HOMOGRAPHY_CACHE_SIZE)
+executor = StorageExecutor(STORAGE_THREADS)
+
+def get_storage() -> Storage:
+    return storage
+
+def get_zone_maps() -> ZoneMapCache:
+    return zone_maps
+
+def get_events() -> EventBroker:
+    return events
+
+def get_responses() -> ResponseCache:
+    return responses
+
+def get_executor() -> StorageExecutor:
+    return executor
+
+def get_validations() -> ValidationCache:
+    return validations
+
+def get_history() -> BoundaryHistory:
+    return history
+
+def get_homographies() -> HomographyCache:
+    return homographies
+
+def get_match_service(
+    storage: Storage = Depends(get_storage),
+    events: EventBroker = Depends(get_events),
+    responses: ResponseCache = Depends(get_responses)
+) -> MatchService:
+    return MatchService(storage, events, responses)
+
+def get_boundary_service(
+    storage: Storage = Depends(get_storage),
+    zone_maps: ZoneMapCache = Depends(get_zone_maps),
+    events: EventBroker = Depends(get_events),
+    responses: ResponseCache = Depends(get_responses),
+    validations: ValidationCache = Depends(get_validations),
+    history: BoundaryHistory = Depends(get_history),
+    homographies: HomographyCache = Depends(get_homographies)
+) -> BoundaryService:
+    return BoundaryService(storage, zone_maps, events, responses, validations, history, homographies)
\ No newline at end of file
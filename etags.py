@@ -0,0 +1,14 @@
+import hashlib
+from typing import Optional
+
+
+def make_etag(body: bytes) -> str:
+    # A hash of the body rather than the store version, which is an in-process
+    # counter, so every worker process issues the same ETag for the same data
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
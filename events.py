@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, List, Optional, Set
+
+# Event ids are in-process counters that restart at zero, so they also name the
+# process that issued them and a Last-Event-ID from another one forces a resync
+PROCESS_TOKEN = uuid.uuid4().hex[:12]
+
+
+@dataclass(frozen=True)
+class Event:
+    id: Optional[int]
+    type: str
+    camera_ip: Optional[str]
+    data: dict = field(default_factory=dict)
+
+    def encode(self) -> bytes:
+        payload = json.dumps({"type": self.type, "camera_ip": self.camera_ip, **self.data}, separators=(",", ":"))
+        event_id = f"id: {PROCESS_TOKEN}-{self.id}\n" if self.id is not None else ""
+        return f"{event_id}event: {self.type}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self, camera_ip: Optional[str], queue_size: int):
+        self.camera_ip = camera_ip
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, event: Event):
+        # Runs on the subscriber's event loop
+        if self.camera_ip and event.camera_ip is not None and event.camera_ip != self.camera_ip:
+            return
+        if self.queue.full():
+            self.overflowed = True
+        elif not self.overflowed:
+            self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """In-process pub/sub for the change feed.
+
+    Publishing appends to a ring buffer and hands the event to every
+    subscriber's queue; no storage is read per subscriber. A client resumes
+    by sending the id of the last event it saw, and is replayed everything
+    after it that is still buffered. When that is no longer possible (the
+    id is too old or from another process) it gets a `resync` event and
+    should reload its state. A subscriber that falls more than its queue
+    behind is disconnected after the events it did get, so it can resume
+    from the buffer.
+
+    Only changes made by this process are published, so GET /events refuses
+    to serve when there are several workers.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._next_id = 1
+        self._subscribers: Set[Subscription] = set()
+
+    def publish(self, event_type: str, camera_ip: str, **data) -> Event:
+        with self._lock:
+            event = Event(self._next_id, event_type, camera_ip, data)
+            self._next_id += 1
+            self._buffer.append(event)
+            # Scheduled under the lock so every subscriber sees events in id order
+            for subscription in self._subscribers:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+        return event
+
+    def _subscribe(self, camera_ip: Optional[str], last_event_id: Optional[str]) -> Subscription:
+        subscription = Subscription(camera_ip, self.queue_size)
+        with self._lock:
+            for event in self._backlog(last_event_id):
+                subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _backlog(self, last_event_id: Optional[str]) -> List[Event]:
+        if not last_event_id:
+            return []
+        token, _, number = last_event_id.strip().rpartition("-")
+        oldest = self._buffer[0].id if self._buffer else self._next_id
+        if token != PROCESS_TOKEN or not number.isdigit() or int(number) + 1 < oldest or int(number) >= self._next_id:
+            return [Event(None, "resync", None)]
+        return [event for event in self._buffer if event.id > int(number)]
+
+    async def stream(self, camera_ip: Optional[str], last_event_id: Optional[str],
+                     keepalive_interval: float) -> AsyncIterator[bytes]:
+        """Server-sent events for one client, starting with any replayed backlog."""
+        subscription = self._subscribe(camera_ip, last_event_id)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), keepalive_interval)
+                except asyncio.TimeoutError:
+                    if subscription.overflowed:
+                        return
+                    yield b": keep-alive\n\n"
+                    continue
+                yield event.encode()
+                if subscription.overflowed and subscription.queue.empty():
+                    return
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscription)
@@ -0,0 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class StorageExecutor:
+    """Runs blocking storage calls on a bounded thread pool instead of the event loop.
+
+    Writes additionally take an asyncio lock per key (the camera_ip), so
+    requests for the same camera queue up on the loop one at a time rather
+    than each holding a pool thread while they wait on the backend. Requests
+    for other cameras are not held up by them.
+    """
+
+    def __init__(self, max_workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args))
+
+    async def write(self, key: str, func: Callable[..., T], *args: Any) -> T:
+        async with self._key_lock(key):
+            future = asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The call keeps running in its thread; keep the key locked until it is done
+                await asyncio.wait([future])
+                raise
+
+    async def iterate(self, iterable: Iterable[T]) -> AsyncIterator[T]:
+        """Consumes a blocking iterator on the pool, one item per call."""
+        iterator = iter(iterable)
+        while True:
+            item = await self.run(next, iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    @asynccontextmanager
+    async def _key_lock(self, key: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
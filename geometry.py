@@ -0,0 +1,142 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models import Quad
+
+
+def quads_to_array(quads: Sequence[Quad], dtype=np.float64) -> np.ndarray:
+    """Corner coordinates as an (M, 4, 2) array in UL, UR, LR, LL order."""
+    return np.array(
+        [[q.UL_coord.to_tuple(), q.UR_coord.to_tuple(), q.LR_coord.to_tuple(), q.LL_coord.to_tuple()] for q in quads],
+        dtype=dtype
+    ).reshape(-1, 4, 2)
+
+
+def quad_areas(quads: np.ndarray) -> np.ndarray:
+    x, y = quads[..., 0], quads[..., 1]
+    return 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y, axis=-1))
+
+
+def points_in_convex_quads(points: np.ndarray, quads: np.ndarray) -> np.ndarray:
+    """(N, M) mask of which of the N points lie in which of the M convex quads.
+
+    A point is inside when it is on the same side of all four edges, edges
+    included. Degenerate (zero-area) quads contain nothing.
+    """
+    origins = quads[None, :, :, :]                                   # (1, M, 4, 2)
+    edges = np.roll(quads, -1, axis=1)[None] - origins               # (1, M, 4, 2)
+    offsets = points[:, None, None, :] - origins                     # (N, M, 4, 2)
+    cross = edges[..., 0] * offsets[..., 1] - edges[..., 1] * offsets[..., 0]  # (N, M, 4)
+    inside = np.all(cross >= 0, axis=-1) | np.all(cross <= 0, axis=-1)
+    return inside & (quad_areas(quads) > 0)[None, :]
+
+
+def innermost_indices(mask: np.ndarray) -> np.ndarray:
+    """Index of the last matching quad per point, or -1 when none match.
+
+    Boundary items are ordered OUTER, TABLE, then seats, so the last match
+    is the innermost zone.
+    """
+    count = mask.shape[1]
+    if count == 0:
+        return np.full(mask.shape[0], -1, dtype=np.intp)
+    last = count - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), last, -1)
+
+
+def classify_points(points: Sequence[Tuple[float, float]], quads: Sequence[Quad], labels: Sequence[str]) -> List[Optional[str]]:
+    point_array = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    indices = innermost_indices(points_in_convex_quads(point_array, quads_to_array(quads)))
+    label_array = np.array(list(labels) + [None], dtype=object)
+    return label_array[indices].tolist()
+
+
+def rasterize_quads(quads: np.ndarray, width: int, height: int) -> np.ndarray:
+    """(height, width) uint8 label image of the M quads.
+
+    Pixel (x, y) holds 1 + the index of the last quad containing the point
+    (x, y), or 0 when none does, so it agrees with `innermost_indices` at
+    integer coordinates.
+    """
+    label_map = np.zeros((height, width), dtype=np.uint8)
+    areas = quad_areas(quads)
+    for index, quad in enumerate(quads):
+        if areas[index] == 0:
+            continue
+        x0, y0 = np.maximum(np.ceil(quad.min(axis=0)).astype(int), 0)
+        x1 = min(int(np.floor(quad[:, 0].max())), width - 1)
+        y1 = min(int(np.floor(quad[:, 1].max())), height - 1)
+        if x0 > x1 or y0 > y1:
+            continue
+        xs = np.arange(x0, x1 + 1, dtype=np.float64)[None, :]
+        ys = np.arange(y0, y1 + 1, dtype=np.float64)[:, None]
+        all_positive = np.ones((y1 - y0 + 1, x1 - x0 + 1), dtype=bool)
+        all_negative = all_positive.copy()
+        for corner in range(4):
+            ox, oy = quad[corner]
+            ex, ey = quad[(corner + 1) % 4] - quad[corner]
+            cross = ex * (ys - oy) - ey * (xs - ox)
+            all_positive &= cross >= 0
+            all_negative &= cross <= 0
+        label_map[y0:y1 + 1, x0:x1 + 1][all_positive | all_negative] = index + 1
+    return label_map
+
+
+def _clip_half_plane(polygons: np.ndarray, counts: np.ndarray, signed_distance) -> Tuple[np.ndarray, np.ndarray]:
+    # One Sutherland-Hodgman pass over a batch of padded convex polygons:
+    # polygons is (P, V, 2) with the first counts[p] vertices valid.
+    slots = polygons.shape[1]
+    index = np.arange(slots)[None, :]
+    next_index = np.where(counts[:, None] > 0, (index + 1) % np.maximum(counts[:, None], 1), 0)
+    current = polygons
+    following = np.take_along_axis(polygons, next_index[..., None], axis=1)
+    valid = index < counts[:, None]
+
+    d_current = signed_distance(current)
+    d_following = signed_distance(following)
+    inside_current = d_current >= 0
+    inside_following = d_following >= 0
+    crossing = valid & (inside_current != inside_following)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(crossing, d_current / (d_current - d_following), 0.0)
+    intersection = current + t[..., None] * (following - current)
+
+    # Each edge emits its start vertex (if inside) then the crossing point (if any)
+    candidates = np.stack([current, intersection], axis=2).reshape(len(polygons), 2 * slots, 2)
+    keep = np.stack([valid & inside_current, crossing], axis=2).reshape(len(polygons), 2 * slots)
+    order = np.argsort(~keep, axis=1, kind="stable")
+    new_counts = keep.sum(axis=1)
+    width = max(int(new_counts.max(initial=0)), 1)
+    return np.take_along_axis(candidates, order[..., None], axis=1)[:, :width], new_counts
+
+
+def _polygon_areas(polygons: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    slots = polygons.shape[1]
+    index = np.arange(slots)[None, :]
+    next_index = np.where(counts[:, None] > 0, (index + 1) % np.maximum(counts[:, None], 1), 0)
+    following = np.take_along_axis(polygons, next_index[..., None], axis=1)
+    cross = polygons[..., 0] * following[..., 1] - following[..., 0] * polygons[..., 1]
+    return 0.5 * np.abs(np.sum(np.where(index < counts[:, None], cross, 0.0), axis=1))
+
+
+def box_quad_intersection_areas(boxes: np.ndarray, quads: np.ndarray) -> np.ndarray:
+    """(K, M) intersection areas of K axis-aligned boxes (x1, y1, x2, y2) with M convex quads.
+
+    Every quad is clipped against every box's four sides in one batched
+    pass per side.
+    """
+    count_boxes, count_quads = len(boxes), len(quads)
+    if count_boxes == 0 or count_quads == 0:
+        return np.zeros((count_boxes, count_quads))
+    x1 = np.repeat(np.minimum(boxes[:, 0], boxes[:, 2]), count_quads)[:, None]
+    x2 = np.repeat(np.maximum(boxes[:, 0], boxes[:, 2]), count_quads)[:, None]
+    y1 = np.repeat(np.minimum(boxes[:, 1], boxes[:, 3]), count_quads)[:, None]
+    y2 = np.repeat(np.maximum(boxes[:, 1], boxes[:, 3]), count_quads)[:, None]
+
+    polygons = np.tile(quads, (count_boxes, 1, 1))
+    counts = np.full(len(polygons), 4)
+    for signed_distance in (lambda p: p[..., 0] - x1, lambda p: x2 - p[..., 0],
+                            lambda p: p[..., 1] - y1, lambda p: y2 - p[..., 1]):
+        polygons, counts = _clip_half_plane(polygons, counts, signed_distance)
+    return _polygon_areas(polygons, counts).reshape(count_boxes, count_quads)
@@ -0,0 +1,211 @@
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Any
+
+from models import Boundary, Coordinate, Step
+from journal import Journal
+from config import FRAME_WIDTH, FRAME_HEIGHT
+
+CORNERS = ("UL_coord", "UR_coord", "LR_coord", "LL_coord")
+# Corner coordinates of one item as x, y pairs in CORNERS order
+Coords = Tuple[int, ...]
+Layout = Tuple[Tuple[str, Coords], ...]
+Delta = Tuple[Tuple[int, Coords], ...]
+# Journals this much larger than the retained history are rewritten
+COMPACT_MIN_RECORDS = 1000
+
+
+def to_layout(items: List[Boundary]) -> Layout:
+    return tuple(
+        (item.boundary_type, tuple(value for corner in CORNERS for value in getattr(item, corner).to_tuple()))
+        for item in items
+    )
+
+
+def to_items(layout: Layout) -> List[Boundary]:
+    return [
+        Boundary(boundary_type=boundary_type, **{
+            corner: Coordinate(x=coords[2 * i], y=coords[2 * i + 1]) for i, corner in enumerate(CORNERS)
+        })
+        for boundary_type, coords in layout
+    ]
+
+
+@dataclass
+class HistoryEntry:
+    """One version of a camera's boundaries: either a full keyframe or the items changed since the previous version."""
+    version: int
+    action: str
+    table_id: str
+    step: Step
+    timestamp: float
+    # Width and height of the frame the coordinates are pixels of
+    frame: Tuple[int, int] = (FRAME_WIDTH, FRAME_HEIGHT)
+    keyframe: Optional[Layout] = None
+    delta: Optional[Delta] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "action": self.action,
+            "table_id": self.table_id,
+            "step": self.step,
+            "timestamp": self.timestamp,
+            "frame_width": self.frame[0],
+            "frame_height": self.frame[1],
+            "keyframe": self.keyframe is not None,
+            "changed_items": len(self.keyframe if self.keyframe is not None else self.delta)
+        }
+
+    def to_record(self, camera_ip: str) -> Dict[str, Any]:
+        return {
+            "op": "put", "camera_ip": camera_ip, "version": self.version, "action": self.action,
+            "table_id": self.table_id, "step": self.step.value, "timestamp": self.timestamp, "frame": self.frame,
+            "keyframe": self.keyframe, "delta": self.delta
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "HistoryEntry":
+        keyframe, delta = record["keyframe"], record["delta"]
+        # Records written before frames were kept are in the default frame
+        frame = tuple(record.get("frame") or (FRAME_WIDTH, FRAME_HEIGHT))
+        if keyframe is not None:
+            keyframe = tuple((boundary_type, tuple(coords)) for boundary_type, coords in keyframe)
+        if delta is not None:
+            delta = tuple((index, tuple(coords)) for index, coords in delta)
+        return cls(
+            version=record["version"], action=record["action"], table_id=record["table_id"],
+            step=Step(record["step"]), timestamp=record["timestamp"], frame=frame, keyframe=keyframe, delta=delta
+        )
+
+
+class BoundaryHistory:
+    """The last `retention` versions of every camera's boundaries.
+
+    A version stores only the items whose coordinates changed, except every
+    `keyframe_interval`th version, the first retained one and any version
+    whose item types differ from the previous one, which store the whole
+    layout. Reading a version replays at most `keyframe_interval - 1` deltas
+    onto the keyframe before it.
+
+    With a journal the history survives restarts: every version is appended
+    to it, and it is rewritten with only the retained versions once it grows
+    to twice their number.
+    """
+
+    def __init__(self, retention: int, keyframe_interval: int, journal: Optional[Journal] = None):
+        self.retention = retention
+        self.keyframe_interval = max(keyframe_interval, 1)
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[HistoryEntry]] = {}
+        self._count = 0
+
+    def load(self):
+        if not self.journal or self.retention <= 0:
+            return
+        with self._lock:
+            self._entries = {}
+            self._count = 0
+            for record in self.journal.replay():
+                if record["op"] == "drop":
+                    self._count -= len(self._entries.pop(record["camera_ip"], []))
+                else:
+                    self._append(record["camera_ip"], HistoryEntry.from_record(record))
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+
+    def record(self, action: str, camera_ip: str, table_id: str, step: Step, items: List[Boundary],
+               frame: Tuple[int, int] = (FRAME_WIDTH, FRAME_HEIGHT)):
+        if self.retention <= 0:
+            return
+        layout = to_layout(items)
+        seq = 0
+        with self._lock:
+            entries = self._entries.get(camera_ip, [])
+            entry = HistoryEntry(
+                version=entries[-1].version + 1 if entries else 1,
+                action=action, table_id=table_id, step=step, timestamp=time.time(), frame=frame
+            )
+            previous = self._layout(entries, len(entries) - 1) if entries else None
+            since_keyframe = next((i for i, old in enumerate(reversed(entries)) if old.keyframe is not None), 0)
+            if (previous is None or since_keyframe + 1 >= self.keyframe_interval
+                    or [boundary_type for boundary_type, _ in previous] != [boundary_type for boundary_type, _ in layout]):
+                entry.keyframe = layout
+            else:
+                entry.delta = tuple(
+                    (index, coords) for index, ((_, old), (_, coords)) in enumerate(zip(previous, layout)) if old != coords
+                )
+            self._append(camera_ip, entry)
+            if self.journal:
+                seq = self.journal.enqueue([entry.to_record(camera_ip)])
+                if self.journal.record_count >= max(2 * self._count, COMPACT_MIN_RECORDS):
+                    self._compact()
+                    seq = 0
+        if seq:
+            self.journal.wait(seq)
+
+    def forget(self, camera_ip: str):
+        """Drops a camera's history, once it has no boundaries left to roll back."""
+        seq = 0
+        with self._lock:
+            entries = self._entries.pop(camera_ip, None)
+            if entries is None:
+                return
+            self._count -= len(entries)
+            if self.journal:
+                seq = self.journal.enqueue([{"op": "drop", "camera_ip": camera_ip}])
+        if seq:
+            self.journal.wait(seq)
+
+    def versions(self, camera_ip: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(camera_ip)
+            if not entries:
+                raise ValueError("No history found for the given camera IP.")
+            return [entry.summary() for entry in entries]
+
+    def read(self, camera_ip: str, version: int) -> Tuple[HistoryEntry, List[Boundary]]:
+        with self._lock:
+            entries = self._entries.get(camera_ip)
+            if not entries:
+                raise ValueError("No history found for the given camera IP.")
+            # Versions are consecutive, so the index follows from the oldest one kept
+            index = version - entries[0].version
+            if not 0 <= index < len(entries):
+                raise ValueError(f"Version {version} is not in the history of this camera.")
+            entry, layout = entries[index], self._layout(entries, index)
+        return entry, to_items(layout)
+
+    def _append(self, camera_ip: str, entry: HistoryEntry):
+        entries = self._entries.setdefault(camera_ip, [])
+        entries.append(entry)
+        self._count += 1
+        if len(entries) > self.retention:
+            # The new oldest version must not depend on the ones dropped before it
+            dropped = len(entries) - self.retention
+            oldest = entries[dropped]
+            if oldest.keyframe is None:
+                oldest.keyframe, oldest.delta = self._layout(entries, dropped), None
+            del entries[:dropped]
+            self._count -= dropped
+
+    @staticmethod
+    def _layout(entries: List[HistoryEntry], index: int) -> Layout:
+        start = index
+        while entries[start].keyframe is None:
+            start -= 1
+        layout = list(entries[start].keyframe)
+        for entry in entries[start + 1:index + 1]:
+            for item, coords in entry.delta:
+                layout[item] = (layout[item][0], coords)
+        return tuple(layout)
+
+    def _compact(self):
+        # Called under the lock, so records still queued in the journal are part of the rewrite
+        self.journal.rewrite([
+            entry.to_record(camera_ip) for camera_ip, entries in self._entries.items() for entry in entries
+        ])
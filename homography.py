@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from storage import Storage
+
+# Below this relative singular value the correspondences do not pin down a single homography
+DEGENERATE_TOLERANCE = 1e-10
+# Points with |w| below this map to infinity, e.g. image points on the horizon
+W_TOLERANCE = 1e-12
+
+
+def _normalization(points: np.ndarray) -> np.ndarray:
+    # Hartley normalization: centroid at the origin, mean distance sqrt(2)
+    centroid = points.mean(axis=0)
+    scale = np.sqrt(((points - centroid) ** 2).sum(axis=1)).mean()
+    if scale == 0:
+        raise ValueError("Correspondence points must not all be the same.")
+    scale = np.sqrt(2) / scale
+    return np.array([[scale, 0, -scale * centroid[0]], [0, scale, -scale * centroid[1]], [0, 0, 1]])
+
+
+def apply_homography(matrix: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """(N, 2) images of the (N, 2) `points`, NaN where a point maps to infinity."""
+    mapped = points @ matrix[:, :2].T + matrix[:, 2]
+    w = mapped[:, 2:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.abs(w) > W_TOLERANCE, mapped[:, :2] / w, np.nan)
+
+
+def fit_homography(image_points: Sequence[Tuple[float, float]],
+                   floor_points: Sequence[Tuple[float, float]]) -> Tuple[np.ndarray, float]:
+    """Image to floor homography by normalized DLT, and its RMS reprojection error in floor units.
+
+    Needs at least four correspondences, no three of the first four on a
+    line; with more the fit is least squares.
+    """
+    source = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+    target = np.asarray(floor_points, dtype=np.float64).reshape(-1, 2)
+    if len(source) < 4:
+        raise ValueError("At least 4 point correspondences are needed.")
+    source_transform, target_transform = _normalization(source), _normalization(target)
+    x, y = (source @ source_transform[:2, :2].T + source_transform[:2, 2]).T
+    u, v = (target @ target_transform[:2, :2].T + target_transform[:2, 2]).T
+
+    # Two rows per correspondence of A h = 0, h being the matrix entries row by row
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    a = np.empty((2 * len(x), 9))
+    a[0::2] = np.stack([-x, -y, -ones, zeros, zeros, zeros, u * x, u * y, u], axis=1)
+    a[1::2] = np.stack([zeros, zeros, zeros, -x, -y, -ones, v * x, v * y, v], axis=1)
+    _, singular_values, vt = np.linalg.svd(a)
+    if singular_values[7] < DEGENERATE_TOLERANCE * singular_values[0]:
+        raise ValueError("Correspondence points are degenerate, e.g. three of them on one line.")
+
+    matrix = np.linalg.inv(target_transform) @ vt[-1].reshape(3, 3) @ source_transform
+    if abs(matrix[2, 2]) < W_TOLERANCE or abs(np.linalg.det(matrix)) < W_TOLERANCE * abs(matrix[2, 2]) ** 3:
+        raise ValueError("Correspondence points are degenerate, e.g. three of them on one line.")
+    matrix /= matrix[2, 2]
+
+    residuals = apply_homography(matrix, source) - target
+    return matrix, float(np.sqrt(np.nanmean((residuals ** 2).sum(axis=1))))
+
+
+def check_matrix(matrix: List[List[float]]) -> np.ndarray:
+    array = np.asarray(matrix, dtype=np.float64)
+    if array.shape != (3, 3) or not np.isfinite(array).all():
+        raise ValueError("Homography must be a 3x3 matrix of finite numbers.")
+    if abs(np.linalg.det(array)) < W_TOLERANCE:
+        raise ValueError("Homography must be invertible.")
+    return array
+
+
+class Homography:
+    """A camera's image to floor homography and its inverse, for one boundary version."""
+
+    def __init__(self, camera_ip: str, version: int, matrix: np.ndarray):
+        self.camera_ip = camera_ip
+        self.version = version
+        self.matrix = matrix
+        self.inverse = np.linalg.inv(matrix)
+
+    def transform(self, points: Sequence[Tuple[float, float]], to_floor: bool = True) -> List[Optional[List[float]]]:
+        """Maps all points in one vectorized call; points mapping to infinity come back as None."""
+        array = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        mapped = apply_homography(self.matrix if to_floor else self.inverse, array)
+        finite = np.isfinite(mapped).all(axis=1)
+        result = mapped.tolist()
+        for index in np.flatnonzero(~finite):
+            result[index] = None
+        return result
+
+
+class HomographyCache:
+    """LRU of homographies, reloaded when the camera's boundary version changes.
+
+    Cameras without a homography are cached too, as None, so requests for
+    them do not read the store either.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, Optional[Homography]]]" = OrderedDict()
+
+    def get(self, storage: Storage, camera_ip: str) -> Optional[Homography]:
+        version = storage.boundary_version(camera_ip)
+        with self._lock:
+            cached = self._entries.get(camera_ip)
+            if cached and cached[0] == version:
+                self._entries.move_to_end(camera_ip)
+                return cached[1]
+
+        boundary_table = storage.get_boundary(camera_ip)
+        if not boundary_table:
+            with self._lock:
+                self._entries.pop(camera_ip, None)
+            return None
+
+        homography = None
+        if boundary_table.homography is not None:
+            homography = Homography(camera_ip, version, np.asarray(boundary_table.homography, dtype=np.float64))
+        with self._lock:
+            self._entries[camera_ip] = (version, homography)
+            self._entries.move_to_end(camera_ip)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return homography
@@ -0,0 +1,55 @@
+import json
+from typing import Dict, List, Optional
+
+from models import Boundary, Step
+from utils import get_step_order_for_capacity
+from config import DEFAULT_BOUNDARY_COORDINATES, DEFAULT_LAYOUT_FILE
+
+CORNERS = ("UL", "UR", "LR", "LL")
+FALLBACK_CORNERS = {corner: {"x": 0, "y": 0} for corner in CORNERS}
+
+
+class DefaultLayouts:
+    """Default boundary items per capacity, validated once at startup.
+
+    `items` returns shallow copies of the template models, so callers may
+    replace an item's fields; the Coordinate objects are shared and must
+    not be modified in place.
+    """
+
+    def __init__(self, coordinates: Dict[int, Dict[str, Dict[str, Dict[str, int]]]]):
+        self._templates: Dict[int, List[Boundary]] = {
+            capacity: self._template(capacity, coordinates.get(capacity, {}))
+            for capacity in range(Step.MIN_CAPACITY(), Step.MAX_CAPACITY() + 1)
+        }
+
+    @classmethod
+    def from_file(cls, layout_file: Optional[str]) -> "DefaultLayouts":
+        """Built-in layouts, with the capacities present in `layout_file` replaced.
+
+        The file is JSON shaped like DEFAULT_BOUNDARY_COORDINATES, with the
+        capacities as string keys.
+        """
+        coordinates = dict(DEFAULT_BOUNDARY_COORDINATES)
+        if layout_file:
+            with open(layout_file, "r") as file:
+                overrides = json.load(file)
+            coordinates.update({int(capacity): layout for capacity, layout in overrides.items()})
+        return cls(coordinates)
+
+    @staticmethod
+    def _template(capacity: int, layout: Dict[str, Dict[str, Dict[str, int]]]) -> List[Boundary]:
+        # Items missing from a layout fall back to (0, 0) like get_default_coordinates
+        return [
+            Boundary(
+                boundary_type=step.value,
+                **{f"{corner}_coord": point for corner, point in layout.get(step.value, FALLBACK_CORNERS).items()}
+            )
+            for step in get_step_order_for_capacity(capacity)[:-1]
+        ]
+
+    def items(self, capacity: int) -> List[Boundary]:
+        return [item.model_copy() for item in self._templates.get(capacity, [])]
+
+
+DEFAULT_LAYOUTS = DefaultLayouts.from_file(DEFAULT_LAYOUT_FILE)
@@ -1,27 +1,85 @@
+import time
+import asyncio
 import logging
-from contextlib import asynccontextmanager
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager, suppress
+from typing import List, Dict, Any, Optional
 
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Depends, WebSocket, Header, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from config import BOUNDARY_API_VERSION, setup_logging, logging_config
-from models import GenericResponse, StepChangeRequest, MatchTable, BoundaryTable
-from services import MatchService, BoundaryService
-from dependencies import get_match_service, get_boundary_service
+from config import (
+    BOUNDARY_API_VERSION, STORAGE_BACKEND, WORKERS, STREAM_QUEUE_SIZE, JOURNAL_COMPACT_RECORDS,
+    JOURNAL_COMPACT_INTERVAL, EVENT_KEEPALIVE_INTERVAL, SNAPSHOT_FILE, SNAPSHOT_INTERVAL, setup_logging,
+    logging_config
+)
+from models import (
+    GenericResponse, StepChangeRequest, MatchTable, BoundaryTable, ClassifyRequest, ZoneMapFormat, OccupancyRequest,
+    LayoutRequest, ValidateRequest, HomographyRequest, TransformRequest
+)
+from services import MatchService, BoundaryService, BulkImportError
+from dependencies import get_match_service, get_boundary_service, get_storage, get_events, get_executor, get_history
+from streaming import ZoneStream
+from bulk import parse_matches, dump_matches, MAX_REPORTED_ERRORS
+from etags import make_etag, etag_matches
+from events import EventBroker
+from responses import RawJSONResponse
+from executor import StorageExecutor
+from metrics import MetricsMiddleware, StoreCollector
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger("app")
 logger.info(f"Boundary API version: {BOUNDARY_API_VERSION}")
 
+async def compact_journal_periodically():
+    storage = get_storage()
+    executor = get_executor()
+    while True:
+        await asyncio.sleep(JOURNAL_COMPACT_INTERVAL)
+        if storage.needs_compaction(JOURNAL_COMPACT_RECORDS):
+            try:
+                await executor.run(storage.compact)
+            except OSError:
+                logger.exception("Journal compaction failed")
+
+async def save_snapshot_periodically():
+    storage = get_storage()
+    executor = get_executor()
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await executor.run(storage.save_snapshot)
+        except OSError:
+            logger.exception("Saving the snapshot failed")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    storage = get_storage()
+    start = time.perf_counter()
+    storage.load()
+    logger.info(f"Store loaded in {time.perf_counter() - start:.3f} s")
+    history = get_history()
+    history.load()
+    tasks = []
+    if STORAGE_BACKEND == "journal":
+        tasks.append(asyncio.create_task(compact_journal_periodically()))
+    if STORAGE_BACKEND != "sqlite" and SNAPSHOT_FILE and SNAPSHOT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(save_snapshot_periodically()))
     yield
     # Shutdown
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    get_executor().shutdown()
+    storage.close()
+    history.close()
 
 app = FastAPI(lifespan=lifespan, title="Boundary API", version=BOUNDARY_API_VERSION)
+app.add_middleware(MetricsMiddleware)
+REGISTRY.register(StoreCollector(get_storage()))
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -38,10 +96,28 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 def read_root():
     return GenericResponse(success=True, data={"message": "Boundary API is running."})
 
+@app.get("/metrics")
+async def metrics(executor: StorageExecutor = Depends(get_executor)):
+    # Collecting reads storage for the store gauges
+    return Response(content=await executor.run(generate_latest), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/matches", response_model=GenericResponse)
-async def get_matches(match_service: MatchService = Depends(get_match_service)):
-    matches = match_service.get_all_matches()
-    return GenericResponse(success=True, data=matches)
+async def get_matches(
+    if_none_match: Optional[str] = Header(None),
+    match_service: MatchService = Depends(get_match_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    # Read the version before the data so a concurrent change can only leave the cached body stale, never ahead
+    version = await executor.run(match_service.match_version)
+    # Known ETags answer a revalidation before any body is read or built
+    etag = match_service.get_all_matches_etag(version)
+    if etag and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    content = await executor.run(match_service.get_all_matches_json, version)
+    etag = make_etag(content)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return RawJSONResponse(content, headers={"ETag": etag})
 
 @app.post("/matches", response_model=GenericResponse)
 async def match_table_and_camera(
@@ -49,11 +125,12 @@ async def match_table_and_camera(
     camera_ip: str,
     capacity: int,
     match_service: MatchService = Depends(get_match_service),
-    boundary_service: BoundaryService = Depends(get_boundary_service)
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
 ):
     try:
-        new_match = match_service.create_match(table_id, camera_ip, capacity)
-        boundary_service.create_boundaries(table_id, camera_ip, capacity)
+        new_match = await executor.write(camera_ip, match_service.create_match, table_id, camera_ip, capacity,
+                                         boundary_service)
         return GenericResponse(success=True, data=new_match.dict())
     except ValueError as e:
         return GenericResponse(success=False, data={"detail": str(e)}, status_code=400)
@@ -62,10 +139,12 @@ async def match_table_and_camera(
 async def change_step(
     request: StepChangeRequest,
     match_service: MatchService = Depends(get_match_service),
-    boundary_service: BoundaryService = Depends(get_boundary_service)
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
 ):
     try:
-        updated_match, updated_boundary = match_service.change_step(request, boundary_service)
+        updated_match, updated_boundary = await executor.write(request.camera_ip, match_service.change_step, request,
+                                                               boundary_service)
         return GenericResponse(success=True, data={
             "updated_match": updated_match,
             "updated_boundary": updated_boundary
@@ -77,11 +156,11 @@ async def change_step(
 async def unmatch_table_and_camera(
     camera_ip: str,
     match_service: MatchService = Depends(get_match_service),
-    boundary_service: BoundaryService = Depends(get_boundary_service)
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
 ):
     try:
-        deleted_match = match_service.delete_match(camera_ip)
-        boundary_service.delete_boundaries(camera_ip)
+        deleted_match = await executor.write(camera_ip, match_service.delete_match, camera_ip, boundary_service)
         return GenericResponse(success=True, data={
             "detail": "Match and related boundaries deleted successfully.",
             "deleted_match": deleted_match
@@ -89,25 +168,245 @@ async def unmatch_table_and_camera(
     except ValueError as e:
         return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
 
+@app.post("/bulk/matches", response_model=GenericResponse)
+async def import_matches(
+    request: Request,
+    match_service: MatchService = Depends(get_match_service),
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    records, errors = await parse_matches(request.stream())
+    if errors:
+        return GenericResponse(success=False, data={
+            "detail": f"{len(errors)} invalid line(s); nothing was imported.",
+            "errors": errors[:MAX_REPORTED_ERRORS]
+        }, status_code=400)
+    try:
+        imported = await executor.run(match_service.import_matches, records, boundary_service)
+        return GenericResponse(success=True, data={"imported": len(imported)})
+    except BulkImportError as e:
+        return GenericResponse(success=False, data={"detail": str(e), "errors": e.errors[:MAX_REPORTED_ERRORS]},
+                               status_code=400)
+
+@app.get("/bulk/matches")
+async def export_matches(
+    match_service: MatchService = Depends(get_match_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    return StreamingResponse(executor.iterate(dump_matches(match_service.export_matches())),
+                             media_type="application/x-ndjson")
+
+@app.get("/events")
+async def stream_events(
+    camera_ip: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    events: EventBroker = Depends(get_events)
+):
+    if WORKERS > 1:
+        # Events are published in-process, so a subscriber would silently miss the other workers' writes
+        raise HTTPException(status_code=503, detail="The change feed is only available with a single worker.")
+    return StreamingResponse(
+        events.stream(camera_ip, last_event_id, EVENT_KEEPALIVE_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/boundaries/{camera_ip}", response_model=GenericResponse)
 async def get_boundaries(
+    camera_ip: str,
+    width: Optional[int] = Query(None, gt=0),
+    height: Optional[int] = Query(None, gt=0),
+    if_none_match: Optional[str] = Header(None),
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    if (width is None) != (height is None):
+        return GenericResponse(success=False, data={"detail": "width and height must be given together."},
+                               status_code=400)
+    version = await executor.run(boundary_service.boundary_version, camera_ip)
+    etag = boundary_service.get_boundaries_etag(camera_ip, version, width, height)
+    if etag and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        # Cached body, skipping model validation and serialization of the response
+        content = await executor.run(boundary_service.get_boundaries_json, camera_ip, version, width, height)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+    etag = make_etag(content)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return RawJSONResponse(content, headers={"ETag": etag})
+
+@app.put("/boundaries/{camera_ip}", response_model=GenericResponse)
+async def submit_layout(
+    camera_ip: str,
+    request: LayoutRequest,
+    match_service: MatchService = Depends(get_match_service),
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        updated_match, updated_boundaries = await executor.write(camera_ip, boundary_service.submit_layout, camera_ip,
+                                                                 request, match_service)
+        return GenericResponse(success=True, data={
+            "message": "Boundaries saved successfully",
+            "updated_match": updated_match,
+            "updated_boundaries": updated_boundaries
+        })
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=400)
+
+@app.post("/boundaries/{camera_ip}/validate", response_model=GenericResponse)
+async def validate_boundary(
+    camera_ip: str,
+    request: ValidateRequest,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        result = await executor.run(boundary_service.validate_quad, camera_ip, request)
+        return GenericResponse(success=True, data=result)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+
+# The history lives in each worker's memory, so with several the answer would depend on the worker asked
+HISTORY_UNAVAILABLE = GenericResponse(success=False, data={"detail": "Boundary history is only kept with a single worker."},
+                                      status_code=503)
+
+@app.get("/boundaries/{camera_ip}/history", response_model=GenericResponse)
+async def get_history_versions(
     camera_ip: str,
     boundary_service: BoundaryService = Depends(get_boundary_service)
 ):
+    if WORKERS > 1:
+        return HISTORY_UNAVAILABLE
     try:
-        boundaries = boundary_service.get_boundaries(camera_ip)
-        return GenericResponse(success=True, data=boundaries)
+        return GenericResponse(success=True, data=boundary_service.get_history(camera_ip))
     except ValueError as e:
         return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
 
+@app.get("/boundaries/{camera_ip}/history/{version}", response_model=GenericResponse)
+async def get_history_version(
+    camera_ip: str,
+    version: int,
+    boundary_service: BoundaryService = Depends(get_boundary_service)
+):
+    if WORKERS > 1:
+        return HISTORY_UNAVAILABLE
+    try:
+        return GenericResponse(success=True, data=boundary_service.get_history_version(camera_ip, version))
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+
+@app.post("/boundaries/{camera_ip}/history/{version}/rollback", response_model=GenericResponse)
+async def rollback_boundaries(
+    camera_ip: str,
+    version: int,
+    match_service: MatchService = Depends(get_match_service),
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    if WORKERS > 1:
+        return HISTORY_UNAVAILABLE
+    try:
+        updated_match, updated_boundaries = await executor.write(camera_ip, boundary_service.rollback_boundaries,
+                                                                 camera_ip, version, match_service)
+        return GenericResponse(success=True, data={
+            "message": f"Boundaries rolled back to version {version}",
+            "updated_match": updated_match,
+            "updated_boundaries": updated_boundaries
+        })
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=400)
+
+@app.put("/boundaries/{camera_ip}/homography", response_model=GenericResponse)
+async def set_homography(
+    camera_ip: str,
+    request: HomographyRequest,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        result = await executor.write(camera_ip, boundary_service.set_homography, camera_ip, request)
+        return GenericResponse(success=True, data=result)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=400)
+
+@app.post("/boundaries/{camera_ip}/transform", response_model=GenericResponse)
+async def transform_points(
+    camera_ip: str,
+    request: TransformRequest,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        result = await executor.run(boundary_service.transform_points, camera_ip, request)
+        return GenericResponse(success=True, data=result)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+
+@app.post("/boundaries/{camera_ip}/classify", response_model=GenericResponse)
+async def classify_points(
+    camera_ip: str,
+    request: ClassifyRequest,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        zones = await executor.run(boundary_service.classify_points, camera_ip, request.points)
+        return GenericResponse(success=True, data={"camera_ip": camera_ip, "zones": zones})
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+
+@app.post("/boundaries/{camera_ip}/occupancy", response_model=GenericResponse)
+async def get_occupancy(
+    camera_ip: str,
+    request: OccupancyRequest,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        occupancy = await executor.run(boundary_service.get_occupancy, camera_ip, request)
+        return GenericResponse(success=True, data=occupancy)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=400)
+
+@app.get("/boundaries/{camera_ip}/zone_map")
+async def get_zone_map(
+    camera_ip: str,
+    format: ZoneMapFormat = ZoneMapFormat.raw,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    try:
+        zone_map = await executor.run(boundary_service.get_zone_map, camera_ip)
+    except ValueError as e:
+        return GenericResponse(success=False, data={"detail": str(e)}, status_code=404)
+    return Response(
+        content=zone_map.to_bytes(compressed=format == ZoneMapFormat.zlib),
+        media_type="application/octet-stream",
+        headers={**zone_map.headers(), "X-Zone-Map-Format": format.value}
+    )
+
+@app.websocket("/boundaries/{camera_ip}/stream")
+async def stream_classification(
+    websocket: WebSocket,
+    camera_ip: str,
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
+):
+    await ZoneStream(websocket, boundary_service, camera_ip, STREAM_QUEUE_SIZE, executor).run()
+
 @app.post("/boundaries/{camera_ip}/reset", response_model=GenericResponse)
 async def reset_boundaries(
     camera_ip: str,
     match_service: MatchService = Depends(get_match_service),
-    boundary_service: BoundaryService = Depends(get_boundary_service)
+    boundary_service: BoundaryService = Depends(get_boundary_service),
+    executor: StorageExecutor = Depends(get_executor)
 ):
     try:
-        updated_match, updated_boundaries = boundary_service.reset_boundaries(camera_ip, match_service)
+        updated_match, updated_boundaries = await executor.write(camera_ip, boundary_service.reset_boundaries, camera_ip,
+                                                                 match_service)
         return GenericResponse(success=True, data={
             "message": "Boundaries reset successfully",
             "updated_match": updated_match,
@@ -118,4 +417,4 @@ async def reset_boundaries(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080, log_config=logging_config)
+    uvicorn.run("main:app", host="0.0.0.0", port=8080, workers=WORKERS, log_config=logging_config)
@@ -0,0 +1,81 @@
+import time
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Instrumentation only observes into in-memory histograms and counters;
+# anything that needs storage is computed by StoreCollector at scrape time.
+# With WORKERS > 1 every worker reports its own values.
+
+REQUEST_LATENCY = Histogram(
+    "boundary_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+STORAGE_LATENCY = Histogram(
+    "boundary_storage_duration_seconds", "Latency of blocking storage operations",
+    ["operation"], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+VALIDATION_LATENCY = Histogram(
+    "boundary_validation_duration_seconds", "Boundary validation latency",
+    ["validator"], buckets=(.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01)
+)
+VALIDATION_REJECTS = Counter(
+    "boundary_validation_rejects_total", "Boundaries rejected by validation", ["reason"]
+)
+
+POLYGON_VALIDATION = VALIDATION_LATENCY.labels("polygon")
+PLACEMENT_VALIDATION = VALIDATION_LATENCY.labels("placement")
+
+POLYGON_REJECT_REASONS = {
+    "Polygon has duplicate points.": "duplicate_points",
+    "Polygon is self-intersecting.": "self_intersecting",
+    "Polygon is not convex.": "not_convex",
+}
+
+
+def polygon_rejected(message: str):
+    VALIDATION_REJECTS.labels(POLYGON_REJECT_REASONS.get(message, "invalid_polygon")).inc()
+
+
+def placement_rejected(overlap: str):
+    VALIDATION_REJECTS.labels(f"placement_{overlap.lower()}").inc()
+
+
+class MetricsMiddleware:
+    """Times every HTTP request, labelled with the matched route's path template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Unmatched paths share one label to keep the series count bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+
+
+class StoreCollector:
+    """Gauges read from storage only when /metrics is scraped."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        yield GaugeMetricFamily("boundary_cameras", "Cameras matched to a table", value=self.storage.count_matches())
+        yield GaugeMetricFamily("boundary_store_size_bytes", "Size of the storage files on disk",
+                                value=self.storage.store_size())
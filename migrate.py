@@ -0,0 +1,39 @@
+import argparse
+import logging
+
+from config import MATCH_DB_FILE, BOUNDARY_DB_FILE, SQLITE_DB_FILE, setup_logging
+from models import MatchTable, BoundaryTable
+from sqlite_storage import SqliteStorage
+from utils import load_data
+
+setup_logging()
+logger = logging.getLogger("app")
+
+
+def migrate_json_to_sqlite(match_file: str, boundary_file: str, db_file: str, force: bool = False):
+    matches = [MatchTable(**match) for match in load_data(match_file)]
+    boundaries = [BoundaryTable(**boundary) for boundary in load_data(boundary_file)]
+
+    storage = SqliteStorage(db_file)
+    try:
+        with storage.transaction():
+            if not force and (storage.list_matches() or storage.list_boundaries()):
+                raise ValueError(f"{db_file} already contains data, use --force to merge into it "
+                                 "(tables of the same camera are replaced, others are kept).")
+            for match in matches:
+                storage.save_match(match)
+            for boundary in boundaries:
+                storage.save_boundary(boundary)
+    finally:
+        storage.close()
+    logger.info(f"Migrated {len(matches)} matches and {len(boundaries)} boundary tables into {db_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the JSON match and boundary files into a SQLite database.")
+    parser.add_argument("--match-file", default=MATCH_DB_FILE)
+    parser.add_argument("--boundary-file", default=BOUNDARY_DB_FILE)
+    parser.add_argument("--db-file", default=SQLITE_DB_FILE)
+    parser.add_argument("--force", action="store_true", help="Merge into a database that already has data, replacing tables of the same camera.")
+    args = parser.parse_args()
+    migrate_json_to_sqlite(args.match_file, args.boundary_file, args.db_file, args.force)
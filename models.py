@@ -1,6 +1,7 @@
 from enum import Enum
-from typing import List, Dict, Union
-from pydantic import BaseModel
+from typing import List, Dict, Union, Tuple, Optional
+from pydantic import BaseModel, PositiveInt
+from config import FRAME_WIDTH, FRAME_HEIGHT
 
 class Step(str, Enum):
     OUTER = "OUTER"
@@ -29,6 +30,18 @@ class Direction(str, Enum):
     next = "next"
     previous = "previous"
 
+class ZoneMapFormat(str, Enum):
+    raw = "raw"
+    zlib = "zlib"
+
+class OccupancyMethod(str, Enum):
+    overlap = "overlap"
+    foot_point = "foot_point"
+
+class TransformDirection(str, Enum):
+    image_to_floor = "image_to_floor"
+    floor_to_image = "floor_to_image"
+
 
 class Coordinate(BaseModel):
     x: int
@@ -56,6 +69,11 @@ class BoundaryTable(BaseModel):
     table_id: str
     camera_ip: str
     items: List[Boundary]
+    # Resolution the item coordinates are pixels of
+    frame_width: PositiveInt = FRAME_WIDTH
+    frame_height: PositiveInt = FRAME_HEIGHT
+    # Image to floor homography, row major
+    homography: Optional[List[List[float]]] = None
     
     class Config:
         allow_population_by_field_name = True
@@ -65,6 +83,45 @@ class GenericResponse(BaseModel):
     data: Union[dict, list]
     status_code: int = 200
 
+class LayoutRequest(BaseModel):
+    items: List[Boundary]
+    # Defaults to the frame the camera's boundaries are stored in
+    frame_width: Optional[PositiveInt] = None
+    frame_height: Optional[PositiveInt] = None
+
+class ValidateRequest(Quad):
+    step: Step
+
 class StepChangeRequest(Quad):
     direction: Direction
-    camera_ip: str
\ No newline at end of file
+    camera_ip: str
+
+class ClassifyRequest(BaseModel):
+    points: List[Tuple[float, float]]
+
+class PointCorrespondence(BaseModel):
+    image: Tuple[float, float]
+    floor: Tuple[float, float]
+
+class HomographyRequest(BaseModel):
+    correspondences: List[PointCorrespondence]
+
+class TransformRequest(BaseModel):
+    points: List[Tuple[float, float]]
+    direction: TransformDirection = TransformDirection.image_to_floor
+
+class OccupancyRequest(BaseModel):
+    boxes: List[Tuple[float, float, float, float]]
+    method: OccupancyMethod = OccupancyMethod.overlap
+    overlap_threshold: Optional[float] = None
+
+
+class BulkMatch(BaseModel):
+    table_id: str
+    camera_ip: str
+    capacity: int
+    step: Optional[Step] = None
+    boundaries: Optional[List[Boundary]] = None
+    frame_width: Optional[PositiveInt] = None
+    frame_height: Optional[PositiveInt] = None
+    homography: Optional[List[List[float]]] = None
@@ -0,0 +1,54 @@
+from typing import List, Sequence, Tuple, Dict, Any
+
+import numpy as np
+
+from models import Boundary, OccupancyMethod
+from geometry import quads_to_array, quad_areas, points_in_convex_quads, box_quad_intersection_areas
+
+
+def seat_occupancy(items: Sequence[Boundary], boxes: Sequence[Tuple[float, float, float, float]],
+                   method: OccupancyMethod, overlap_threshold: float) -> Dict[str, Any]:
+    """Assign person boxes (x1, y1, x2, y2) to the numbered seat boundaries.
+
+    With `overlap`, a box belongs to the seat it overlaps most, provided the
+    overlap covers at least `overlap_threshold` of the smaller of the box and
+    the seat. With `foot_point`, it belongs to the seat containing the middle
+    of its bottom edge. Each box is assigned to at most one seat.
+    """
+    seats = [item for item in items if item.boundary_type.isdigit()]
+    box_array = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    quads = quads_to_array(seats)
+
+    if method == OccupancyMethod.foot_point:
+        foot_points = np.stack([(box_array[:, 0] + box_array[:, 2]) / 2, np.maximum(box_array[:, 1], box_array[:, 3])], axis=1)
+        scores = points_in_convex_quads(foot_points, quads).astype(np.float64)
+        matched = scores > 0
+    else:
+        box_areas = np.abs((box_array[:, 2] - box_array[:, 0]) * (box_array[:, 3] - box_array[:, 1]))
+        smaller = np.minimum(box_areas[:, None], quad_areas(quads)[None, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(smaller > 0, box_quad_intersection_areas(box_array, quads) / smaller, 0.0)
+        matched = scores >= overlap_threshold
+
+    best = np.argmax(np.where(matched, scores, -1.0), axis=1) if seats else np.zeros(len(box_array), dtype=np.intp)
+    assigned = matched.any(axis=1) if seats else np.zeros(len(box_array), dtype=bool)
+
+    assignments: List[str] = [seats[seat].boundary_type if ok else None for seat, ok in zip(best.tolist(), assigned.tolist())]
+    seat_boxes: Dict[str, List[int]] = {seat.boundary_type: [] for seat in seats}
+    for box_index, seat_type in enumerate(assignments):
+        if seat_type is not None:
+            seat_boxes[seat_type].append(box_index)
+
+    occupied_seats = sum(1 for box_indices in seat_boxes.values() if box_indices)
+    return {
+        "assignments": assignments,
+        "seats": {
+            seat_type: {"occupied": bool(box_indices), "boxes": box_indices}
+            for seat_type, box_indices in seat_boxes.items()
+        },
+        "table": {
+            "occupied": occupied_seats > 0,
+            "occupied_seats": occupied_seats,
+            "capacity": len(seats),
+        },
+    }
@@ -0,0 +1,364 @@
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Any, Tuple, Iterator, ContextManager
+
+from models import MatchTable, BoundaryTable
+from utils import load_data, save_data, FileLock
+from journal import Journal
+from snapshot import Snapshot
+from storage import Storage, MATCH_TABLE
+from config import STORE_RECHECK_INTERVAL
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(file_path: str) -> FileSignature:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class Repository(Storage):
+    """Process-wide in-memory copy of the match and boundary files.
+
+    Records are kept as plain dicts indexed by camera_ip (with a secondary
+    table_id index), so lookups never re-parse the JSON files. The files are
+    re-read only when their mtime/size changes, e.g. after an external edit
+    of the mounted volume.
+
+    With a journal, mutations are appended to it instead of rewriting the
+    files; the JSON files then act as the snapshot the journal is replayed
+    on top of, and `compact` folds the journal back into them.
+
+    With a snapshot, the first load maps the binary snapshot instead of
+    parsing the files when they are unchanged since it was taken.
+    """
+
+    def __init__(self, match_file: str, boundary_file: str, journal: Optional[Journal] = None,
+                 lock_file: Optional[str] = None, recheck_interval: float = STORE_RECHECK_INTERVAL,
+                 snapshot: Optional[Snapshot] = None):
+        super().__init__()
+        self.match_file = match_file
+        self.boundary_file = boundary_file
+        self.journal = journal
+        self.snapshot = snapshot
+        # Only needed when several worker processes share the files
+        self.process_lock = FileLock(lock_file) if lock_file else None
+        self.recheck_interval = recheck_interval
+        self._lock = threading.RLock()
+        self._matches: Dict[str, Dict[str, Any]] = {}
+        self._match_tables: Dict[str, str] = {}
+        self._boundaries: Dict[str, Dict[str, Any]] = {}
+        self._boundary_tables: Dict[str, str] = {}
+        self._signatures: Dict[str, FileSignature] = {}
+        self._snapshot_signatures: Optional[Dict[str, FileSignature]] = None
+        self._checked_at = 0.0
+        self._transaction: Optional[List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]] = None
+
+    def load(self):
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.recheck_interval:
+            return
+        self._checked_at = now
+        if not self._changed(self._current_signatures()):
+            return
+        with self._hold_process_lock(shared=True), self._lock:
+            if self._transaction is not None:
+                return
+            # Replaying only sees records on disk and would drop the ones other
+            # threads have applied and queued; they are enqueued under this lock
+            if self.journal and not self.journal.idle():
+                return
+            signatures = self._current_signatures()
+            if self._changed(signatures):
+                # The snapshot only stands in for the files on the first load
+                if self._signatures or not self._load_snapshot(signatures):
+                    self._reload()
+            self._signatures = signatures
+
+    def _changed(self, signatures: Dict[str, FileSignature]) -> bool:
+        if self.journal:
+            signature = signatures[self.journal.path]
+            if signature is not None and signature == self.journal.signature:
+                # Grown only by our own appends, which were applied in memory before being queued
+                signatures = {**signatures, self.journal.path: self._signatures.get(self.journal.path)}
+        return signatures != self._signatures
+
+    def _hold_process_lock(self, shared: bool = False) -> ContextManager[None]:
+        # Always taken before self._lock to keep a single lock order
+        return self.process_lock.hold(shared) if self.process_lock else nullcontext()
+
+    def _current_signatures(self) -> Dict[str, FileSignature]:
+        return {file_path: file_signature(file_path) for file_path in self._tracked_files()}
+
+    def _tracked_files(self) -> List[str]:
+        files = [self.match_file, self.boundary_file]
+        if self.journal:
+            files.append(self.journal.path)
+        return files
+
+    def _reload(self):
+        self._matches, self._match_tables = self._index(load_data(self.match_file))
+        self._boundaries, self._boundary_tables = self._index(load_data(self.boundary_file))
+        if self.journal:
+            for record in self.journal.replay():
+                self._apply(record)
+        self.boundary_versions.bump_all()
+        self.match_versions.bump_all()
+
+    def _load_snapshot(self, signatures: Dict[str, FileSignature]) -> bool:
+        loaded = self.snapshot.read() if self.snapshot else None
+        if loaded is None:
+            return False
+        (matches, boundaries), metadata = loaded
+        if metadata.get("signatures") != {path: list(signature) if signature else None
+                                          for path, signature in signatures.items()}:
+            return False
+        self._matches, self._match_tables = self._index(matches)
+        self._boundaries, self._boundary_tables = self._index(boundaries)
+        if self.journal:
+            self.journal.record_count = metadata.get("journal_records", 0)
+        self._snapshot_signatures = signatures
+        self.boundary_versions.bump_all()
+        self.match_versions.bump_all()
+        return True
+
+    def _collection(self, op: str) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        if op.startswith("match."):
+            return self._matches, self._match_tables
+        return self._boundaries, self._boundary_tables
+
+    def _apply(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Apply one journal-style record to the indexes and return the record it replaced
+        op = record["op"]
+        if op == "batch":
+            for item in record["records"]:
+                self._apply(item)
+            return None
+        by_camera, by_table = self._collection(op)
+        camera_ip = self._camera_ip(record)
+        if op.endswith(".put"):
+            new = record["record"]
+            previous = by_camera.get(camera_ip)
+            if previous and previous["table_id"] != new["table_id"]:
+                by_table.pop(previous["table_id"], None)
+            self._put(by_camera, by_table, new)
+        else:
+            previous = self._pop(by_camera, by_table, camera_ip)
+        # Bump after the change so a reader never caches old data under the new version
+        self._bump(op, camera_ip)
+        return previous
+
+    def _undo(self, record: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+        by_camera, by_table = self._collection(record["op"])
+        camera_ip = self._camera_ip(record)
+        self._pop(by_camera, by_table, camera_ip)
+        if previous:
+            self._put(by_camera, by_table, previous)
+        self._bump(record["op"], camera_ip)
+
+    def _bump(self, op: str, camera_ip: str):
+        if op.startswith("boundary."):
+            self.boundary_versions.bump(camera_ip)
+        else:
+            self.match_versions.bump(MATCH_TABLE)
+
+    @staticmethod
+    def _camera_ip(record: Dict[str, Any]) -> str:
+        return record["record"]["camera_ip"] if "record" in record else record["camera_ip"]
+
+    @staticmethod
+    def _index(records: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        by_camera = {record["camera_ip"]: record for record in records}
+        by_table = {record["table_id"]: record["camera_ip"] for record in records}
+        return by_camera, by_table
+
+    @staticmethod
+    def _put(by_camera: Dict[str, Dict[str, Any]], by_table: Dict[str, str], record: Dict[str, Any]):
+        by_camera[record["camera_ip"]] = record
+        by_table[record["table_id"]] = record["camera_ip"]
+
+    @staticmethod
+    def _pop(by_camera: Dict[str, Dict[str, Any]], by_table: Dict[str, str], camera_ip: str) -> Optional[Dict[str, Any]]:
+        record = by_camera.pop(camera_ip, None)
+        if record:
+            by_table.pop(record["table_id"], None)
+        return record
+
+    def _persist(self, records: List[Dict[str, Any]]) -> int:
+        # Called under the lock; in journal mode it only queues the records and
+        # the caller waits on the returned sequence after unlocking.
+        if self.journal:
+            # A batch is a single line, so a torn write drops the whole transaction
+            return self.journal.enqueue(records if len(records) == 1 else [{"op": "batch", "records": records}])
+        if any(record["op"].startswith("match.") for record in records):
+            save_data(self.match_file, list(self._matches.values()))
+            self._signatures[self.match_file] = file_signature(self.match_file)
+        if any(record["op"].startswith("boundary.") for record in records):
+            save_data(self.boundary_file, list(self._boundaries.values()))
+            self._signatures[self.boundary_file] = file_signature(self.boundary_file)
+        return 0
+
+    def _wait(self, seq: int):
+        if self.journal and seq:
+            self.journal.wait(seq)
+            with self._lock:
+                signature = file_signature(self.journal.path)
+                if signature is not None and signature == self.journal.signature:
+                    self._signatures[self.journal.path] = signature
+
+    def _mutate(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Journal records must be durable before other processes may take the
+        # lock and replay the journal, so the wait stays inside the process lock
+        with self._hold_process_lock():
+            with self._lock:
+                previous = self._apply(record)
+                if record["op"].endswith(".delete") and previous is None:
+                    return None
+                if self._transaction is not None:
+                    self._transaction.append((record, previous))
+                    return previous
+                seq = self._persist([record])
+            self._wait(seq)
+        return previous
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._hold_process_lock():
+            if self._transaction is None:
+                # Pick up writes from other processes before reading for a read-modify-write
+                self.refresh(force=True)
+            with self._lock:
+                if self._transaction is not None:
+                    yield
+                    return
+                self._transaction = []
+                try:
+                    yield
+                    seq = self._persist([record for record, _ in self._transaction]) if self._transaction else 0
+                except BaseException:
+                    for record, previous in reversed(self._transaction):
+                        self._undo(record, previous)
+                    raise
+                finally:
+                    self._transaction = None
+            self._wait(seq)
+
+    def close(self):
+        if self.journal:
+            self.compact()
+            self.journal.close()
+        self.save_snapshot()
+
+    def store_size(self) -> int:
+        return sum(signature[1] for signature in self._current_signatures().values() if signature)
+
+    def save_snapshot(self):
+        if not self.snapshot:
+            return
+        with self._lock:
+            # Skip while journal records are queued: the indexes would be ahead of the files.
+            # Writes are applied and persisted under the lock, so otherwise they match.
+            if self._signatures == self._snapshot_signatures or (self.journal and not self.journal.idle()):
+                return
+            signatures = dict(self._signatures)
+            matches = list(self._matches.values())
+            boundaries = list(self._boundaries.values())
+            journal_records = self.journal.record_count if self.journal else 0
+        metadata = {
+            "signatures": {path: list(signature) if signature else None for path, signature in signatures.items()},
+            "journal_records": journal_records
+        }
+        self.snapshot.write(matches, boundaries, metadata)
+        self._snapshot_signatures = signatures
+
+    def needs_compaction(self, max_records: int) -> bool:
+        return bool(self.journal) and self.journal.record_count >= max_records
+
+    def compact(self):
+        if not self.journal:
+            return
+        with self._hold_process_lock():
+            # Fold in records other processes appended since our last reload
+            self.refresh(force=True)
+            with self._lock:
+                save_data(self.match_file, list(self._matches.values()))
+                save_data(self.boundary_file, list(self._boundaries.values()))
+                self.journal.truncate()
+                self._signatures = self._current_signatures()
+
+    # Matches
+
+    def list_matches(self) -> List[MatchTable]:
+        self.refresh()
+        with self._lock:
+            matches = list(self._matches.values())
+        return [MatchTable(**match) for match in matches]
+
+    def count_matches(self) -> int:
+        self.refresh()
+        with self._lock:
+            return len(self._matches)
+
+    def get_match(self, camera_ip: str) -> Optional[MatchTable]:
+        self.refresh()
+        with self._lock:
+            match = self._matches.get(camera_ip)
+        return MatchTable(**match) if match else None
+
+    def get_match_by_table(self, table_id: str) -> Optional[MatchTable]:
+        self.refresh()
+        with self._lock:
+            camera_ip = self._match_tables.get(table_id)
+            match = self._matches.get(camera_ip) if camera_ip else None
+        return MatchTable(**match) if match else None
+
+    def save_match(self, match: MatchTable):
+        self._mutate({"op": "match.put", "record": match.model_dump(mode="json")})
+
+    def delete_match(self, camera_ip: str) -> Optional[MatchTable]:
+        match = self._mutate({"op": "match.delete", "camera_ip": camera_ip})
+        return MatchTable(**match) if match else None
+
+    def match_version(self) -> int:
+        self.refresh()
+        return super().match_version()
+
+    # Boundaries
+
+    def boundary_version(self, camera_ip: str) -> int:
+        self.refresh()
+        return super().boundary_version(camera_ip)
+
+    def list_boundaries(self) -> List[BoundaryTable]:
+        self.refresh()
+        with self._lock:
+            boundaries = list(self._boundaries.values())
+        return [BoundaryTable(**boundary) for boundary in boundaries]
+
+    def get_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        self.refresh()
+        with self._lock:
+            boundary = self._boundaries.get(camera_ip)
+        return BoundaryTable(**boundary) if boundary else None
+
+    def get_boundary_by_table(self, table_id: str) -> Optional[BoundaryTable]:
+        self.refresh()
+        with self._lock:
+            camera_ip = self._boundary_tables.get(table_id)
+            boundary = self._boundaries.get(camera_ip) if camera_ip else None
+        return BoundaryTable(**boundary) if boundary else None
+
+    def save_boundary(self, boundary: BoundaryTable):
+        self._mutate({"op": "boundary.put", "record": boundary.model_dump(mode="json")})
+
+    def delete_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        boundary = self._mutate({"op": "boundary.delete", "camera_ip": camera_ip})
+        return BoundaryTable(**boundary) if boundary else None
@@ -0,0 +1,73 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi.responses import Response
+
+from etags import make_etag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class RawJSONResponse(Response):
+    """Sends already serialized JSON bytes as they are."""
+
+    media_type = "application/json"
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+class ResponseCache:
+    """LRU of serialized response bodies per key, valid for one version of the key.
+
+    The ETag of each body built is kept in a second, larger LRU, so a
+    conditional request can be answered by version after its body was evicted.
+    """
+
+    def __init__(self, max_size: int, etag_size: int):
+        self.max_size = max_size
+        self.etag_size = etag_size
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        self._etags: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+
+    def get(self, key: str, version: int, build: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached and cached[0] == version:
+                self._bodies.move_to_end(key)
+                return cached[1]
+
+        body = build()
+        etag = make_etag(body)
+        with self._lock:
+            self._bodies[key] = (version, body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+            self._etags[key] = (version, etag)
+            self._etags.move_to_end(key)
+            while len(self._etags) > self.etag_size:
+                self._etags.popitem(last=False)
+        return body
+
+    def etag(self, key: str, version: int) -> Optional[str]:
+        """The ETag of the body last built for `key` at `version`, without building it."""
+        with self._lock:
+            cached = self._etags.get(key)
+            if not cached or cached[0] != version:
+                return None
+            self._etags.move_to_end(key)
+            return cached[1]
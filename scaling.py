@@ -0,0 +1,42 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from models import BoundaryTable
+from history import to_layout, to_items
+
+Frame = Tuple[int, int]
+
+
+def frame_of(boundary_table: BoundaryTable) -> Frame:
+    return boundary_table.frame_width, boundary_table.frame_height
+
+
+def scale_homography(matrix: Optional[List[List[float]]], source: Frame, target: Frame) -> Optional[List[List[float]]]:
+    """The image to floor homography of a `source` frame, for pixels of a `target` frame of the same view."""
+    if matrix is None or source == target:
+        return matrix
+    # Pixels of the target frame go back to the source frame before the original mapping
+    scale = np.diag([source[0] / target[0], source[1] / target[1], 1.0])
+    return (np.asarray(matrix, dtype=np.float64) @ scale).tolist()
+
+
+def rescale(boundary_table: BoundaryTable, width: int, height: int) -> BoundaryTable:
+    """A copy of `boundary_table` with its coordinates and homography in pixels of a width x height frame.
+
+    All corners are scaled in one array operation and rounded to the nearest pixel.
+    """
+    source = frame_of(boundary_table)
+    if source == (width, height):
+        return boundary_table
+    layout = to_layout(boundary_table.items)
+    coords = np.array([coords for _, coords in layout], dtype=np.float64).reshape(-1, 8)
+    scaled = np.rint(coords * np.tile([width / source[0], height / source[1]], 4)).astype(np.int64).tolist()
+    return BoundaryTable(
+        table_id=boundary_table.table_id,
+        camera_ip=boundary_table.camera_ip,
+        items=to_items(tuple((boundary_type, row) for (boundary_type, _), row in zip(layout, scaled))),
+        frame_width=width,
+        frame_height=height,
+        homography=scale_homography(boundary_table.homography, source, (width, height))
+    )
@@ -1,35 +1,98 @@
-import json
-from typing import List, Tuple, Dict, Any
-from pydantic import BaseModel
-from models import MatchTable, BoundaryTable, Step, StepChangeRequest, Direction, Boundary, Quad, Coordinate
-from utils import load_data, save_data, get_next_or_previous_step
-from validators import PolygonValidator, IntersectionValidator
-from config import BOUNDARY_DB_FILE, MATCH_DB_FILE, DefaultBoundaryCoordinates
+from typing import List, Tuple, Optional, Iterator
+from models import MatchTable, BoundaryTable, Step, StepChangeRequest, Direction, Boundary, Quad, OccupancyRequest, BulkMatch, LayoutRequest, ValidateRequest, HomographyRequest, TransformRequest, TransformDirection
+from utils import get_next_or_previous_step, get_step_order_for_capacity
+from validators import PolygonValidator, Overlap, classify_overlaps
+from geometry import classify_points
+from zone_maps import ZoneMapCache, ZoneMap
+from occupancy import seat_occupancy
+from config import OCCUPANCY_OVERLAP_THRESHOLD
+from layouts import DEFAULT_LAYOUTS
+from storage import Storage
+from events import EventBroker
+from metrics import POLYGON_VALIDATION, PLACEMENT_VALIDATION, polygon_rejected, placement_rejected
+from responses import ResponseCache, dumps
+from validation_cache import ValidationCache
+from history import BoundaryHistory
+from homography import HomographyCache, Homography, fit_homography, check_matrix
+from scaling import Frame, frame_of, rescale, scale_homography
+from config import FRAME_WIDTH, FRAME_HEIGHT
+
+class BulkImportError(ValueError):
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid record(s); nothing was imported.")
+        self.errors = errors
+
+def publish_match_event(events: EventBroker, event_type: str, match: MatchTable):
+    # Published only after the transaction has committed
+    events.publish(event_type, match.camera_ip, table_id=match.table_id, step=match.step.value)
+
+def requested_frame(width: Optional[int], height: Optional[int], default: Frame) -> Frame:
+    if (width is None) != (height is None):
+        raise ValueError("frame_width and frame_height must be given together.")
+    return (width, height) if width is not None else default
+
+# Response cache key of the match list; camera IPs, the other keys, cannot contain a slash
+MATCHES_RESPONSE_KEY = "/matches"
+
+
+def boundaries_key(camera_ip: str, width: Optional[int], height: Optional[int]) -> str:
+    return camera_ip if width is None else f"{camera_ip}@{width}x{height}"
+
 
 class MatchService:
+    def __init__(self, storage: Storage, events: EventBroker, responses: ResponseCache):
+        self.storage = storage
+        self.events = events
+        self.responses = responses
+
     def get_all_matches(self) -> List[MatchTable]:
-        return [MatchTable(**match) for match in load_data(MATCH_DB_FILE)]
+        return self.storage.list_matches()
+
+    def get_all_matches_json(self, version: int) -> bytes:
+        """The serialized success response of `get_all_matches`, cached until the match `version` changes."""
+        return self.responses.get(MATCHES_RESPONSE_KEY, version, lambda: dumps({
+            "success": True,
+            "data": [match.model_dump(mode="json", by_alias=True) for match in self.get_all_matches()],
+            "status_code": 200
+        }))
+
+    def get_all_matches_etag(self, version: int) -> Optional[str]:
+        """The ETag of `get_all_matches_json` at `version` if it was built, without reading storage."""
+        return self.responses.etag(MATCHES_RESPONSE_KEY, version)
+
+    def match_version(self) -> int:
+        return self.storage.match_version()
 
-    def create_match(self, table_id: str, camera_ip: str, capacity: int) -> MatchTable:
+    def create_match(self, table_id: str, camera_ip: str, capacity: int, boundary_service: 'BoundaryService') -> MatchTable:
         if not all([table_id, camera_ip, capacity]):
             raise ValueError("Invalid request data.")
 
         if not Step.check_capacity(capacity):
             raise ValueError(f"Invalid capacity. Must be between {Step.MIN_CAPACITY()} and {Step.MAX_CAPACITY()}.")
 
-        matches = self.get_all_matches()
-        if any(m.table_id == table_id or m.camera_ip == camera_ip for m in matches):
-            raise ValueError("Match already exists.")
+        with self.storage.transaction():
+            if self.storage.get_match(camera_ip) or self.storage.get_match_by_table(table_id):
+                raise ValueError("Match already exists.")
 
-        new_match = MatchTable(table_id=table_id, camera_ip=camera_ip, step=Step.OUTER, capacity=capacity)
-        matches.append(new_match)
-        save_data(MATCH_DB_FILE, [match.model_dump() for match in matches])
+            new_match = MatchTable(table_id=table_id, camera_ip=camera_ip, step=Step.OUTER, capacity=capacity)
+            self.storage.save_match(new_match)
+            boundary_table = boundary_service.create_boundaries(table_id, camera_ip, capacity)
+        publish_match_event(self.events, "match.created", new_match)
+        boundary_service.record_history("match.created", new_match, boundary_table)
         return new_match
 
     def change_step(self, request: StepChangeRequest, boundary_service: 'BoundaryService') -> Tuple[MatchTable, Boundary]:
+        with self.storage.transaction():
+            match, updated_boundary = self._change_step(request, boundary_service)
+            boundary_table = self.storage.get_boundary(request.camera_ip) if updated_boundary else None
+        publish_match_event(self.events, "match.step_changed", match)
+        if boundary_table:
+            boundary_service.record_history("match.step_changed", match, boundary_table)
+        return match, updated_boundary
+
+    def _change_step(self, request: StepChangeRequest, boundary_service: 'BoundaryService') -> Tuple[MatchTable, Boundary]:
         updated_boundary=None
-        matches = self.get_all_matches()
-        match = next((m for m in matches if m.camera_ip == request.camera_ip), None)
+        match = self.storage.get_match(request.camera_ip)
         if not match:
             raise ValueError("Match not found.")
 
@@ -52,44 +115,117 @@ class MatchService:
         )
         match.step = new_step
 
-        save_data(MATCH_DB_FILE, [m.model_dump() for m in matches])
+        self.storage.save_match(match)
         return match, updated_boundary
 
-    def delete_match(self, camera_ip: str) -> MatchTable:
-        matches = self.get_all_matches()
-        deleted_match = next((m for m in matches if m.camera_ip == camera_ip), None)
-        if deleted_match:
-            matches = [m for m in matches if m.camera_ip != camera_ip]
-            save_data(MATCH_DB_FILE, [m.model_dump() for m in matches])
-            return deleted_match
-        raise ValueError("Match not found.")
+    def delete_match(self, camera_ip: str, boundary_service: 'BoundaryService') -> MatchTable:
+        with self.storage.transaction():
+            deleted_match = self.storage.delete_match(camera_ip)
+            if not deleted_match:
+                raise ValueError("Match not found.")
+            boundary_service.delete_boundaries(camera_ip)
+        publish_match_event(self.events, "match.deleted", deleted_match)
+        boundary_service.forget_history(camera_ip)
+        return deleted_match
+
+    def import_matches(self, records: List[Tuple[int, BulkMatch]], boundary_service: 'BoundaryService') -> List[MatchTable]:
+        """Creates all records in one transaction, or none of them if any record is invalid."""
+        errors = []
+        imported = []
+        with self.storage.transaction():
+            for line_number, record in records:
+                try:
+                    imported.append(self._import_match(record, boundary_service))
+                except ValueError as e:
+                    errors.append({"line": line_number, "detail": str(e)})
+            if errors:
+                raise BulkImportError(errors)
+        for match, boundary_table in imported:
+            publish_match_event(self.events, "match.created", match)
+            boundary_service.record_history("match.created", match, boundary_table)
+        return [match for match, _ in imported]
+
+    def _import_match(self, record: BulkMatch, boundary_service: 'BoundaryService') -> Tuple[MatchTable, BoundaryTable]:
+        if not all([record.table_id, record.camera_ip, record.capacity]):
+            raise ValueError("Invalid request data.")
+
+        if not Step.check_capacity(record.capacity):
+            raise ValueError(f"Invalid capacity. Must be between {Step.MIN_CAPACITY()} and {Step.MAX_CAPACITY()}.")
 
-class BoundaryService:
-    def create_boundaries(self, table_id: str, camera_ip: str, capacity: int):
-        boundaries = load_data(BOUNDARY_DB_FILE)
-        boundary_items = []
-        for boundary_type in ["OUTER", "TABLE"] + [str(i) for i in range(1, capacity + 1)]:
-            default_coords = DefaultBoundaryCoordinates.get_default_coordinates(boundary_type, capacity)
-            new_boundary = Boundary(
-                boundary_type=boundary_type,
-                UL_coord=Coordinate(**default_coords["UL"]),
-                UR_coord=Coordinate(**default_coords["UR"]),
-                LR_coord=Coordinate(**default_coords["LR"]),
-                LL_coord=Coordinate(**default_coords["LL"])
+        # Earlier records of the same import are already visible inside the transaction
+        if self.storage.get_match(record.camera_ip) or self.storage.get_match_by_table(record.table_id):
+            raise ValueError("Match already exists.")
+
+        step = record.step or (Step.FINAL if record.boundaries else Step.OUTER)
+        if step not in get_step_order_for_capacity(record.capacity):
+            raise ValueError(f"Invalid step {step.value} for capacity {record.capacity}.")
+        if record.boundaries is None and step != Step.OUTER:
+            raise ValueError("Boundaries are required past the OUTER step.")
+        if record.boundaries is not None:
+            boundary_service.validate_layout(record.boundaries, record.capacity, step)
+        if record.homography is not None:
+            check_matrix(record.homography)
+            if record.boundaries is None:
+                raise ValueError("A homography can only be imported with boundaries.")
+        frame_width, frame_height = requested_frame(record.frame_width, record.frame_height, (FRAME_WIDTH, FRAME_HEIGHT))
+        if record.frame_width is not None and record.boundaries is None:
+            raise ValueError("A frame size can only be imported with boundaries.")
+
+        new_match = MatchTable(table_id=record.table_id, camera_ip=record.camera_ip, step=step, capacity=record.capacity)
+        self.storage.save_match(new_match)
+        if record.boundaries is None:
+            boundary_table = boundary_service.create_boundaries(record.table_id, record.camera_ip, record.capacity)
+        else:
+            boundary_table = BoundaryTable(
+                table_id=record.table_id,
+                camera_ip=record.camera_ip,
+                items=record.boundaries,
+                frame_width=frame_width,
+                frame_height=frame_height,
+                homography=record.homography
+            )
+            self.storage.save_boundary(boundary_table)
+        return new_match, boundary_table
+
+    def export_matches(self) -> Iterator[BulkMatch]:
+        # Boundaries are read one camera at a time as the export is consumed
+        for match in self.storage.list_matches():
+            boundary = self.storage.get_boundary(match.camera_ip)
+            yield BulkMatch(
+                table_id=match.table_id,
+                camera_ip=match.camera_ip,
+                capacity=match.capacity,
+                step=match.step,
+                boundaries=boundary.items if boundary else None,
+                frame_width=boundary.frame_width if boundary else None,
+                frame_height=boundary.frame_height if boundary else None,
+                homography=boundary.homography if boundary else None
             )
-            boundary_items.append(new_boundary)
+
+class BoundaryService:
+    def __init__(self, storage: Storage, zone_maps: ZoneMapCache, events: EventBroker, responses: ResponseCache,
+                 validations: ValidationCache, history: BoundaryHistory, homographies: HomographyCache):
+        self.storage = storage
+        self.zone_maps = zone_maps
+        self.events = events
+        self.responses = responses
+        self.validations = validations
+        self.history = history
+        self.homographies = homographies
+
+    def create_boundaries(self, table_id: str, camera_ip: str, capacity: int) -> BoundaryTable:
+        boundary_items = DEFAULT_LAYOUTS.items(capacity)
         
         new_boundary_table = BoundaryTable(
             table_id=table_id,
             camera_ip=camera_ip,
             items=boundary_items
         )
-        boundaries.append(new_boundary_table.model_dump())
-        save_data(BOUNDARY_DB_FILE, boundaries)
+        self.storage.save_boundary(new_boundary_table)
+        return new_boundary_table
 
     def update_boundary(self, request: StepChangeRequest, current_step: Step) -> Boundary:
-        boundaries = load_data(BOUNDARY_DB_FILE)
-        boundary = next((BoundaryTable(**b) for b in boundaries if b["camera_ip"] == request.camera_ip), None)
+        boundary = self.storage.get_boundary(request.camera_ip)
         if not boundary:
             raise ValueError("Boundary not found.")
 
@@ -100,7 +236,7 @@ class BoundaryService:
             LR_coord=request.LR_coord,
             LL_coord=request.LL_coord
         )
-        valid, message = PolygonValidator(quad).is_valid_polygon()
+        valid, message = self._check_polygon(quad)
         if not valid:
             raise ValueError(message)
 
@@ -110,7 +246,8 @@ class BoundaryService:
             raise ValueError(f"No boundary found for step {current_step.value}")
 
         # Perform boundary-specific validations
-        self._validate_boundary_placement(boundary.items, current_step, quad)
+        with PLACEMENT_VALIDATION.time():
+            self._validate_boundary_placement(boundary.items, current_step, quad)
 
         # Update the boundary
         current_boundary.UL_coord = request.UL_coord
@@ -118,76 +255,213 @@ class BoundaryService:
         current_boundary.LR_coord = request.LR_coord
         current_boundary.LL_coord = request.LL_coord
 
-        updated_boundaries = [b if b["camera_ip"] != boundary.camera_ip else boundary.model_dump() for b in boundaries]
-        save_data(BOUNDARY_DB_FILE, updated_boundaries)
+        self.storage.save_boundary(boundary)
         return current_boundary
 
+    def validate_quad(self, camera_ip: str, request: ValidateRequest) -> dict:
+        """Checks `request` as `change_step` would at `request.step`, without saving anything.
+
+        Results are cached per boundary version, read before the boundaries
+        as for `get_boundaries_json`.
+        """
+        version = self.storage.boundary_version(camera_ip)
+        corners = (request.UL_coord, request.UR_coord, request.LR_coord, request.LL_coord)
+        coordinates = tuple(corner.to_tuple() for corner in corners)
+        key = (camera_ip, version, request.step, coordinates)
+        valid, message = self.validations.get(key, lambda: self._validate_quad(camera_ip, request))
+        return {"camera_ip": camera_ip, "step": request.step, "valid": valid, "detail": message}
+
+    def _validate_quad(self, camera_ip: str, request: ValidateRequest) -> Tuple[bool, str]:
+        boundary = self.storage.get_boundary(camera_ip)
+        if not boundary:
+            raise ValueError("No boundaries found for the given camera IP.")
+        if not any(item.boundary_type == request.step.value for item in boundary.items):
+            raise ValueError(f"No boundary found for step {request.step.value}")
+
+        quad = Quad(
+            UL_coord=request.UL_coord,
+            UR_coord=request.UR_coord,
+            LR_coord=request.LR_coord,
+            LL_coord=request.LL_coord
+        )
+        valid, message = self._check_polygon(quad)
+        if not valid:
+            return False, message
+        try:
+            with PLACEMENT_VALIDATION.time():
+                self._validate_boundary_placement(boundary.items, request.step, quad)
+        except ValueError as e:
+            return False, str(e)
+        return True, "Boundary is valid."
+
+    def validate_layout(self, items: List[Boundary], capacity: int, step: Step):
+        """Checks a complete item list as if it had been entered step by step up to `step`.
+
+        Items of later steps still hold their defaults and are not checked.
+        """
+        step_order = get_step_order_for_capacity(capacity)
+        expected = [item_step.value for item_step in step_order[:-1]]
+        if [item.boundary_type for item in items] != expected:
+            raise ValueError(f"Boundaries must be {', '.join(expected)} in this order.")
+
+        calibrated = items[:step_order.index(step)]
+        # Every quad must be a valid polygon before placements between them mean anything
+        for item in calibrated:
+            valid, message = self._check_polygon(item)
+            if not valid:
+                raise ValueError(f"{item.boundary_type} boundary: {message}")
+        with PLACEMENT_VALIDATION.time():
+            self._check_placements([check for item in calibrated
+                                    for check in self._placement_checks(calibrated, Step(item.boundary_type), item)])
+
+    @staticmethod
+    def _check_polygon(quad: Quad) -> Tuple[bool, str]:
+        with POLYGON_VALIDATION.time():
+            valid, message = PolygonValidator(quad).is_valid_polygon()
+        if not valid:
+            polygon_rejected(message)
+        return valid, message
+
     def _validate_boundary_placement(self, boundary_items: List[Boundary], current_step: Step, new_quad: Quad):
+        self._check_placements(self._placement_checks(boundary_items, current_step, new_quad))
+
+    @staticmethod
+    def _placement_checks(boundary_items: List[Boundary], current_step: Step,
+                          new_quad: Quad) -> List[Tuple[str, Quad, Boundary, Tuple[Overlap, ...]]]:
+        """(name, quad, other item, allowed overlaps) for every item `new_quad` must be checked against."""
         if current_step == Step.OUTER:
-            self._validate_outer_boundary(boundary_items, new_quad)
-        elif current_step == Step.TABLE:
-            self._validate_table_boundary(boundary_items, new_quad)
-        else:
-            self._validate_numbered_boundary(boundary_items, current_step, new_quad)
-
-    def _validate_outer_boundary(self, boundary_items: List[Boundary], new_quad: Quad):
-        for item in boundary_items:
-            if item.boundary_type != "OUTER":
-                other_quad = Quad(
-                    UL_coord=item.UL_coord,
-                    UR_coord=item.UR_coord,
-                    LR_coord=item.LR_coord,
-                    LL_coord=item.LL_coord
-                )
-                valid, message = IntersectionValidator(new_quad, other_quad).is_valid_placement()
-                if not valid:
-                    raise ValueError(f"OUTER boundary intersects with {item.boundary_type} boundary.")
-
-    def _validate_table_boundary(self, boundary_items: List[Boundary], new_quad: Quad):
-        outer_boundary = next((item for item in boundary_items if item.boundary_type == "OUTER"), None)
-        if outer_boundary:
-            outer_quad = Quad(
-                UL_coord=outer_boundary.UL_coord,
-                UR_coord=outer_boundary.UR_coord,
-                LR_coord=outer_boundary.LR_coord,
-                LL_coord=outer_boundary.LL_coord
-            )
-            valid, message = IntersectionValidator(new_quad, outer_quad).is_valid_placement()
-            if not valid:
-                raise ValueError("TABLE boundary intersects with OUTER boundary.")
-
-    def _validate_numbered_boundary(self, boundary_items: List[Boundary], current_step: Step, new_quad: Quad):
-        for item in boundary_items:
-            if item.boundary_type not in [current_step.value, "TABLE"]:
-                other_quad = Quad(
-                    UL_coord=item.UL_coord,
-                    UR_coord=item.UR_coord,
-                    LR_coord=item.LR_coord,
-                    LL_coord=item.LL_coord
-                )
-                valid, message = IntersectionValidator(new_quad, other_quad).is_valid_placement()
-                if not valid:
-                    raise ValueError(f"Boundary {current_step.value} intersects with {item.boundary_type} boundary.")
-
-    def get_boundaries(self, camera_ip: str) -> dict:
-        boundaries = load_data(BOUNDARY_DB_FILE)
-        camera_boundaries = next((b for b in boundaries if b["camera_ip"] == camera_ip), None)
+            return [("OUTER boundary", new_quad, item, (Overlap.SEPARATE, Overlap.CONTAINS))
+                    for item in boundary_items if item.boundary_type != "OUTER"]
+        if current_step == Step.TABLE:
+            return [("TABLE boundary", new_quad, item, (Overlap.SEPARATE, Overlap.CONTAINED))
+                    for item in boundary_items if item.boundary_type == "OUTER"][:1]
+        # A seat may sit inside OUTER but must not touch, overlap or nest with another seat
+        return [
+            (f"Boundary {current_step.value}", new_quad, item,
+             (Overlap.SEPARATE, Overlap.CONTAINED) if item.boundary_type == "OUTER" else (Overlap.SEPARATE,))
+            for item in boundary_items if item.boundary_type not in [current_step.value, "TABLE"]
+        ]
+
+    @staticmethod
+    def _check_placements(checks: List[Tuple[str, Quad, Boundary, Tuple[Overlap, ...]]]):
+        # All pairs are classified in one pass; the first offending one in check order is reported
+        overlaps = classify_overlaps([(quad, item) for _, quad, item, _ in checks])
+        for (name, _, item, permitted), overlap in zip(checks, overlaps):
+            if overlap in permitted:
+                continue
+            placement_rejected(overlap.value)
+            if overlap == Overlap.CONTAINS:
+                raise ValueError(f"{name} contains {item.boundary_type} boundary.")
+            if overlap == Overlap.CONTAINED:
+                raise ValueError(f"{name} lies inside {item.boundary_type} boundary.")
+            raise ValueError(f"{name} intersects with {item.boundary_type} boundary.")
+
+    def get_boundaries(self, camera_ip: str, width: Optional[int] = None, height: Optional[int] = None) -> dict:
+        boundary_table = self.storage.get_boundary(camera_ip)
         
-        if not camera_boundaries:
+        if not boundary_table:
             raise ValueError("No boundaries found for the given camera IP.")
-        
-        boundary_table = BoundaryTable(**camera_boundaries)
+
+        if width is not None:
+            boundary_table = rescale(boundary_table, width, height)
         
         return boundary_table.model_dump(by_alias=True)
 
+    def get_boundaries_json(self, camera_ip: str, version: int, width: Optional[int] = None,
+                            height: Optional[int] = None) -> bytes:
+        """The serialized success response of `get_boundaries`, cached until `version` changes.
+
+        Each resolution asked for is cached separately, so a camera read at
+        a steady stream resolution is rescaled once per boundary version.
+        `version` must be read before the boundaries, as the route does.
+        """
+        return self.responses.get(boundaries_key(camera_ip, width, height), version, lambda: dumps({
+            "success": True,
+            "data": self.get_boundaries(camera_ip, width, height),
+            "status_code": 200
+        }))
+
+    def get_boundaries_etag(self, camera_ip: str, version: int, width: Optional[int] = None,
+                            height: Optional[int] = None) -> Optional[str]:
+        """The ETag of `get_boundaries_json` at `version` if it was built, without reading storage."""
+        return self.responses.etag(boundaries_key(camera_ip, width, height), version)
+
+    def boundary_version(self, camera_ip: str) -> int:
+        return self.storage.boundary_version(camera_ip)
+
+    def get_zone_map(self, camera_ip: str) -> ZoneMap:
+        zone_map = self.zone_maps.get(self.storage, camera_ip)
+        if not zone_map:
+            raise ValueError("No boundaries found for the given camera IP.")
+        return zone_map
+
+    def classify_points(self, camera_ip: str, points: List[Tuple[float, float]]) -> List[Optional[str]]:
+        # Exact geometry: the zone map raster rounds points to pixels, which is off near the edges
+        boundary_table = self.storage.get_boundary(camera_ip)
+        if not boundary_table:
+            raise ValueError("No boundaries found for the given camera IP.")
+
+        return classify_points(points, boundary_table.items, [item.boundary_type for item in boundary_table.items])
+
+    def get_occupancy(self, camera_ip: str, request: OccupancyRequest) -> dict:
+        overlap_threshold = request.overlap_threshold
+        if overlap_threshold is None:
+            overlap_threshold = OCCUPANCY_OVERLAP_THRESHOLD
+        if not 0 < overlap_threshold <= 1:
+            raise ValueError("Overlap threshold must be between 0 and 1.")
+
+        boundary_table = self.storage.get_boundary(camera_ip)
+        if not boundary_table:
+            raise ValueError("No boundaries found for the given camera IP.")
+
+        occupancy = seat_occupancy(boundary_table.items, request.boxes, request.method, overlap_threshold)
+        return {"camera_ip": camera_ip, "table_id": boundary_table.table_id, **occupancy}
+
     def delete_boundaries(self, camera_ip: str):
-        boundaries = load_data(BOUNDARY_DB_FILE)
-        boundaries = [b for b in boundaries if b["camera_ip"] != camera_ip]
-        save_data(BOUNDARY_DB_FILE, boundaries)
+        self.storage.delete_boundary(camera_ip)
 
     def reset_boundaries(self, camera_ip: str, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
-        matches = match_service.get_all_matches()
-        match = next((m for m in matches if m.camera_ip == camera_ip), None)
+        with self.storage.transaction():
+            match, boundary_table = self._reset_boundaries(camera_ip, match_service)
+        publish_match_event(self.events, "boundaries.reset", match)
+        self.record_history("boundaries.reset", match, boundary_table)
+        return match, boundary_table
+
+    def submit_layout(self, camera_ip: str, request: LayoutRequest, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
+        """Saves a complete calibration in one step and moves the match to FINAL."""
+        with self.storage.transaction():
+            match, boundary_table = self._submit_layout(camera_ip, request, match_service)
+        publish_match_event(self.events, "boundaries.submitted", match)
+        self.record_history("boundaries.submitted", match, boundary_table)
+        return match, boundary_table
+
+    def _submit_layout(self, camera_ip: str, request: LayoutRequest, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
+        match = match_service.storage.get_match(camera_ip)
+        if not match:
+            raise ValueError("No match found for the given camera IP.")
+
+        self.validate_layout(request.items, match.capacity, Step.FINAL)
+        boundary_table = self.storage.get_boundary(camera_ip)
+        current_frame = frame_of(boundary_table) if boundary_table else (FRAME_WIDTH, FRAME_HEIGHT)
+        frame = requested_frame(request.frame_width, request.frame_height, current_frame)
+
+        match.step = Step.FINAL
+        match_service.storage.save_match(match)
+
+        new_boundary_table = BoundaryTable(
+            table_id=match.table_id,
+            camera_ip=camera_ip,
+            items=request.items,
+            frame_width=frame[0],
+            frame_height=frame[1],
+            homography=scale_homography(boundary_table.homography, current_frame, frame) if boundary_table else None
+        )
+        self.storage.save_boundary(new_boundary_table)
+
+        return match, new_boundary_table
+
+    def _reset_boundaries(self, camera_ip: str, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
+        match = match_service.storage.get_match(camera_ip)
         if not match:
             raise ValueError("No match found for the given camera IP.")
 
@@ -195,32 +469,106 @@ class BoundaryService:
         capacity = match.capacity
 
         match.step = Step.OUTER
-        save_data(MATCH_DB_FILE, [m.model_dump() for m in matches])
+        match_service.storage.save_match(match)
 
-        boundaries = load_data(BOUNDARY_DB_FILE)
-        boundary_index = next((i for i, b in enumerate(boundaries) if b["camera_ip"] == camera_ip), None)
-        if boundary_index is None:
+        boundary_table = self.storage.get_boundary(camera_ip)
+        if not boundary_table:
             raise ValueError("No boundaries found for the given camera IP.")
 
-        boundary_items = []
-        for boundary_type in ["OUTER", "TABLE"] + [str(i) for i in range(1, capacity + 1)]:
-            default_coords = DefaultBoundaryCoordinates.get_default_coordinates(boundary_type, capacity)
-            new_boundary = Boundary(
-                boundary_type=boundary_type,
-                UL_coord=Coordinate(**default_coords["UL"]),
-                UR_coord=Coordinate(**default_coords["UR"]),
-                LR_coord=Coordinate(**default_coords["LR"]),
-                LL_coord=Coordinate(**default_coords["LL"])
-            )
-            boundary_items.append(new_boundary)
+        boundary_items = DEFAULT_LAYOUTS.items(capacity)
 
+        # The homography describes the camera, not the seats, so it survives a reset,
+        # moved to the frame of the default layout
         new_boundary_table = BoundaryTable(
             table_id=table_id,
             camera_ip=camera_ip,
-            items=boundary_items
+            items=boundary_items,
+            homography=scale_homography(boundary_table.homography, frame_of(boundary_table), (FRAME_WIDTH, FRAME_HEIGHT))
         )
 
-        boundaries[boundary_index] = new_boundary_table.model_dump()
-        save_data(BOUNDARY_DB_FILE, boundaries)
+        self.storage.save_boundary(new_boundary_table)
+
+        return match, new_boundary_table
+
+    def record_history(self, action: str, match: MatchTable, boundary_table: BoundaryTable):
+        # Recorded only after the transaction has committed, like the events
+        self.history.record(action, match.camera_ip, match.table_id, match.step, boundary_table.items,
+                            frame_of(boundary_table))
+
+    def forget_history(self, camera_ip: str):
+        self.history.forget(camera_ip)
+
+    def get_history(self, camera_ip: str) -> dict:
+        return {"camera_ip": camera_ip, "versions": self.history.versions(camera_ip)}
+
+    def get_history_version(self, camera_ip: str, version: int) -> dict:
+        entry, items = self.history.read(camera_ip, version)
+        return {"camera_ip": camera_ip, **entry.summary(), "items": items}
 
-        return match, new_boundary_table
\ No newline at end of file
+    def rollback_boundaries(self, camera_ip: str, version: int, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
+        """Restores the boundaries and step of an earlier version as a new version."""
+        with self.storage.transaction():
+            match, boundary_table = self._rollback_boundaries(camera_ip, version, match_service)
+        publish_match_event(self.events, "boundaries.rolled_back", match)
+        self.record_history("boundaries.rolled_back", match, boundary_table)
+        return match, boundary_table
+
+    def _rollback_boundaries(self, camera_ip: str, version: int, match_service: 'MatchService') -> Tuple[MatchTable, BoundaryTable]:
+        match = match_service.storage.get_match(camera_ip)
+        if not match:
+            raise ValueError("No match found for the given camera IP.")
+
+        entry, items = self.history.read(camera_ip, version)
+        self.validate_layout(items, match.capacity, entry.step)
+        boundary_table = self.storage.get_boundary(camera_ip)
+
+        match.step = entry.step
+        match_service.storage.save_match(match)
+
+        new_boundary_table = BoundaryTable(
+            table_id=match.table_id,
+            camera_ip=camera_ip,
+            items=items,
+            frame_width=entry.frame[0],
+            frame_height=entry.frame[1],
+            homography=scale_homography(boundary_table.homography, frame_of(boundary_table), entry.frame)
+            if boundary_table else None
+        )
+        self.storage.save_boundary(new_boundary_table)
+
+        return match, new_boundary_table
+
+    def set_homography(self, camera_ip: str, request: HomographyRequest) -> dict:
+        """Fits the camera's image to floor homography to point correspondences and stores it with its boundaries."""
+        image_points = [correspondence.image for correspondence in request.correspondences]
+        floor_points = [correspondence.floor for correspondence in request.correspondences]
+        matrix, reprojection_error = fit_homography(image_points, floor_points)
+        with self.storage.transaction():
+            boundary_table = self.storage.get_boundary(camera_ip)
+            if not boundary_table:
+                raise ValueError("No boundaries found for the given camera IP.")
+            boundary_table.homography = matrix.tolist()
+            self.storage.save_boundary(boundary_table)
+        self.events.publish("homography.updated", camera_ip, table_id=boundary_table.table_id,
+                            reprojection_error=reprojection_error)
+        return {
+            "camera_ip": camera_ip,
+            "homography": boundary_table.homography,
+            "reprojection_error": reprojection_error,
+            "points": len(image_points)
+        }
+
+    def get_homography(self, camera_ip: str) -> Homography:
+        homography = self.homographies.get(self.storage, camera_ip)
+        if not homography:
+            raise ValueError("No homography found for the given camera IP.")
+        return homography
+
+    def transform_points(self, camera_ip: str, request: TransformRequest) -> dict:
+        homography = self.get_homography(camera_ip)
+        to_floor = request.direction == TransformDirection.image_to_floor
+        return {
+            "camera_ip": camera_ip,
+            "direction": request.direction,
+            "points": homography.transform(request.points, to_floor)
+        }
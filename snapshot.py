@@ -0,0 +1,177 @@
+import gc
+import os
+import json
+import mmap
+import struct
+import tempfile
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from metrics import STORAGE_LATENCY
+from utils import keep_mode
+
+MAGIC = b"BMSS"
+FORMAT_VERSION = 3
+# magic, format version, metadata length, string, match, boundary and item counts
+HEADER = struct.Struct("<4sHxxqqqqq")
+CORNERS = ("UL_coord", "UR_coord", "LR_coord", "LL_coord")
+
+Records = Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+class Snapshot:
+    """Binary copy of the whole store, for a fast cold start.
+
+    Coordinates are kept as int64 arrays and every id, step and boundary type
+    as an index into a single string table, so loading is a memory map plus
+    one pass building the records, instead of parsing the JSON files. The
+    JSON files stay the source of truth: the snapshot records the signatures
+    of the files it was taken from, and `read` ignores it unless they still
+    match.
+
+    Layout, all little-endian and 8-byte aligned: HEADER, JSON metadata,
+    string offsets (int64, strings + 1), UTF-8 string data, matches (int64
+    rows of table_id, camera_ip, step, capacity), boundaries (table_id,
+    camera_ip, item count, frame width and height, 0 for records without
+    them), items (boundary_type, then x, y of each corner)
+    and homographies (float64 rows of the 9 matrix entries, NaN for none).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @STORAGE_LATENCY.labels("snapshot_save").time()
+    def write(self, matches: List[Dict[str, Any]], boundaries: List[Dict[str, Any]], metadata: Dict[str, Any]):
+        strings: Dict[str, int] = {}
+
+        def string(value: str) -> int:
+            return strings.setdefault(value, len(strings))
+
+        match_rows = [
+            (string(m["table_id"]), string(m["camera_ip"]), string(m["step"]), m["capacity"]) for m in matches
+        ]
+        boundary_rows = [
+            (string(b["table_id"]), string(b["camera_ip"]), len(b["items"]), b.get("frame_width", 0),
+             b.get("frame_height", 0))
+            for b in boundaries
+        ]
+        item_rows = [
+            (string(item["boundary_type"]), *(item[corner][axis] for corner in CORNERS for axis in ("x", "y")))
+            for b in boundaries for item in b["items"]
+        ]
+        homographies = np.full((len(boundaries), 9), np.nan, dtype="<f8")
+        for row, b in zip(homographies, boundaries):
+            if b.get("homography") is not None:
+                row[:] = np.ravel(b["homography"])
+
+        encoded = [value.encode() for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        meta = json.dumps(metadata).encode()
+        sections = [
+            HEADER.pack(MAGIC, FORMAT_VERSION, len(meta), len(encoded), len(match_rows), len(boundary_rows),
+                        len(item_rows)),
+            _padded(meta),
+            offsets.tobytes(),
+            _padded(b"".join(encoded)),
+            np.array(match_rows, dtype="<i8").reshape(-1, 4).tobytes(),
+            np.array(boundary_rows, dtype="<i8").reshape(-1, 5).tobytes(),
+            np.array(item_rows, dtype="<i8").reshape(-1, 9).tobytes(),
+            homographies.tobytes(),
+        ]
+
+        # Write to a temp file and rename it over the target so a reader never maps a partial snapshot
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            keep_mode(fd, self.path)
+            with os.fdopen(fd, "wb") as f:
+                f.writelines(sections)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @STORAGE_LATENCY.labels("snapshot_load").time()
+    def read(self) -> Optional[Tuple[Records, Dict[str, Any]]]:
+        """The match and boundary records and the metadata, or None when there is no usable snapshot."""
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < HEADER.size:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # The records hold no cycles; collections triggered by building
+                    # hundreds of thousands of small dicts would only cost time
+                    enabled = gc.isenabled()
+                    gc.disable()
+                    try:
+                        return self._decode(mapped)
+                    finally:
+                        if enabled:
+                            gc.enable()
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error):
+            # Truncated or foreign file, fall back to the JSON files
+            return None
+
+    @staticmethod
+    def _decode(mapped: mmap.mmap) -> Optional[Tuple[Records, Dict[str, Any]]]:
+        magic, version, meta_size, string_count, match_count, boundary_count, item_count = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        position = HEADER.size
+        metadata = json.loads(mapped[position:position + meta_size])
+        position += meta_size + (-meta_size % 8)
+
+        # Views are converted to lists right away: the map cannot close while an array still points into it
+        offsets = np.frombuffer(mapped, dtype="<i8", count=string_count + 1, offset=position).tolist()
+        position += 8 * (string_count + 1)
+        data = mapped[position:position + offsets[-1]]
+        strings = [data[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+        position += offsets[-1] + (-offsets[-1] % 8)
+
+        def rows(count: int, width: int, dtype: str = "<i8") -> np.ndarray:
+            nonlocal position
+            array = np.frombuffer(mapped, dtype=dtype, count=count * width, offset=position)
+            position += 8 * count * width
+            return array.reshape(count, width)
+
+        match_rows, boundary_rows = rows(match_count, 4).tolist(), rows(boundary_count, 5).tolist()
+        item_rows, homography_rows = rows(item_count, 9).tolist(), rows(boundary_count, 9, "<f8")
+        present = ~np.isnan(homography_rows).any(axis=1)
+        homographies = [row.reshape(3, 3).tolist() if keep else None for row, keep in zip(homography_rows, present)]
+        if position != len(mapped):
+            return None
+
+        matches = [
+            {"table_id": strings[table], "camera_ip": strings[camera], "step": strings[step], "capacity": capacity}
+            for table, camera, step, capacity in match_rows
+        ]
+        items = [
+            {
+                "UL_coord": {"x": ulx, "y": uly}, "UR_coord": {"x": urx, "y": ury},
+                "LR_coord": {"x": lrx, "y": lry}, "LL_coord": {"x": llx, "y": lly},
+                "boundary_type": strings[boundary_type]
+            }
+            for boundary_type, ulx, uly, urx, ury, lrx, lry, llx, lly in item_rows
+        ]
+        boundaries = []
+        start = 0
+        for (table, camera, count, frame_width, frame_height), homography in zip(boundary_rows, homographies):
+            boundary = {
+                "table_id": strings[table], "camera_ip": strings[camera], "items": items[start:start + count],
+                "homography": homography
+            }
+            if frame_width:
+                boundary["frame_width"], boundary["frame_height"] = frame_width, frame_height
+            boundaries.append(boundary)
+            start += count
+        return (matches, boundaries), metadata
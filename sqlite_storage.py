@@ -0,0 +1,256 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Iterator
+
+from models import MatchTable, BoundaryTable, Boundary, Coordinate
+from storage import Storage, MATCH_TABLE
+from metrics import STORAGE_LATENCY
+from config import FRAME_WIDTH, FRAME_HEIGHT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    camera_ip TEXT PRIMARY KEY,
+    table_id TEXT NOT NULL UNIQUE,
+    step TEXT NOT NULL,
+    capacity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boundary_tables (
+    camera_ip TEXT PRIMARY KEY,
+    table_id TEXT NOT NULL,
+    frame_width INTEGER NOT NULL,
+    frame_height INTEGER NOT NULL,
+    homography TEXT
+);
+CREATE INDEX IF NOT EXISTS boundary_tables_table_id ON boundary_tables (table_id);
+CREATE TABLE IF NOT EXISTS boundary_items (
+    camera_ip TEXT NOT NULL REFERENCES boundary_tables (camera_ip) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    boundary_type TEXT NOT NULL,
+    ul_x INTEGER NOT NULL, ul_y INTEGER NOT NULL,
+    ur_x INTEGER NOT NULL, ur_y INTEGER NOT NULL,
+    lr_x INTEGER NOT NULL, lr_y INTEGER NOT NULL,
+    ll_x INTEGER NOT NULL, ll_y INTEGER NOT NULL,
+    PRIMARY KEY (camera_ip, position)
+);
+"""
+
+ITEM_COLUMNS = "boundary_type, ul_x, ul_y, ur_x, ur_y, lr_x, lr_y, ll_x, ll_y"
+TABLE_COLUMNS = "table_id, frame_width, frame_height, homography"
+# boundary_tables columns added since the first schema, as existing databases get them
+ADDED_TABLE_COLUMNS = {
+    "frame_width": f"INTEGER NOT NULL DEFAULT {FRAME_WIDTH}",
+    "frame_height": f"INTEGER NOT NULL DEFAULT {FRAME_HEIGHT}",
+    "homography": "TEXT",
+}
+
+
+class SqliteStorage(Storage):
+    """SQLite backend with one row per match, boundary table and boundary item.
+
+    A single connection is shared by all threads of the process and guarded
+    by a lock; other worker processes coordinate through SQLite's own locking
+    (WAL journal, BEGIN IMMEDIATE for writes).
+    """
+
+    def __init__(self, db_file: str, timeout: float = 30.0):
+        super().__init__()
+        self.db_file = db_file
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._depth = 0
+        self._data_version: Optional[int] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.load()
+        return self._connection
+
+    def load(self):
+        with self._lock:
+            if self._connection is not None:
+                return
+            connection = sqlite3.connect(self.db_file, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(SCHEMA)
+            existing = {row[1] for row in connection.execute("PRAGMA table_info(boundary_tables)")}
+            for column, definition in ADDED_TABLE_COLUMNS.items():
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE boundary_tables ADD COLUMN {column} {definition}")
+            self._connection = connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            connection = self.connection
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            connection.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield
+            except BaseException:
+                connection.execute("ROLLBACK")
+                self.boundary_versions.bump_all()
+                self.match_versions.bump_all()
+                raise
+            else:
+                with STORAGE_LATENCY.labels("sqlite_commit").time():
+                    connection.execute("COMMIT")
+            finally:
+                self._depth = 0
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self._lock, STORAGE_LATENCY.labels("sqlite_query").time():
+            return self.connection.execute(sql, parameters).fetchall()
+
+    # Matches
+
+    def list_matches(self) -> List[MatchTable]:
+        rows = self._query("SELECT table_id, camera_ip, step, capacity FROM matches ORDER BY rowid")
+        return [self._match(row) for row in rows]
+
+    def count_matches(self) -> int:
+        return self._query("SELECT COUNT(*) FROM matches")[0][0]
+
+    def get_match(self, camera_ip: str) -> Optional[MatchTable]:
+        rows = self._query("SELECT table_id, camera_ip, step, capacity FROM matches WHERE camera_ip = ?", (camera_ip,))
+        return self._match(rows[0]) if rows else None
+
+    def get_match_by_table(self, table_id: str) -> Optional[MatchTable]:
+        rows = self._query("SELECT table_id, camera_ip, step, capacity FROM matches WHERE table_id = ?", (table_id,))
+        return self._match(rows[0]) if rows else None
+
+    def save_match(self, match: MatchTable):
+        with self.transaction():
+            self.connection.execute(
+                "INSERT INTO matches (camera_ip, table_id, step, capacity) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (camera_ip) DO UPDATE SET table_id = excluded.table_id, "
+                "step = excluded.step, capacity = excluded.capacity",
+                (match.camera_ip, match.table_id, match.step.value, match.capacity)
+            )
+            self.match_versions.bump(MATCH_TABLE)
+
+    def delete_match(self, camera_ip: str) -> Optional[MatchTable]:
+        with self.transaction():
+            match = self.get_match(camera_ip)
+            if match:
+                self.connection.execute("DELETE FROM matches WHERE camera_ip = ?", (camera_ip,))
+                self.match_versions.bump(MATCH_TABLE)
+            return match
+
+    @staticmethod
+    def _match(row: tuple) -> MatchTable:
+        table_id, camera_ip, step, capacity = row
+        return MatchTable(table_id=table_id, camera_ip=camera_ip, step=step, capacity=capacity)
+
+    # Boundaries
+
+    def store_size(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.db_file, self.db_file + "-wal") if os.path.exists(path))
+
+    def boundary_version(self, camera_ip: str) -> int:
+        self._check_data_version()
+        return super().boundary_version(camera_ip)
+
+    def match_version(self) -> int:
+        self._check_data_version()
+        return super().match_version()
+
+    def _check_data_version(self):
+        # data_version only changes when another connection commits
+        with self._lock:
+            data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is not None and data_version != self._data_version:
+                self.boundary_versions.bump_all()
+                self.match_versions.bump_all()
+            self._data_version = data_version
+
+    def list_boundaries(self) -> List[BoundaryTable]:
+        with self._lock:
+            tables = self._query(f"SELECT camera_ip, {TABLE_COLUMNS} FROM boundary_tables ORDER BY rowid")
+            items = {}
+            for row in self._query(f"SELECT camera_ip, {ITEM_COLUMNS} FROM boundary_items ORDER BY camera_ip, position"):
+                items.setdefault(row[0], []).append(self._item(row[1:]))
+        return [self._table(row[0], row[1:], items.get(row[0], [])) for row in tables]
+
+    def get_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        with self._lock:
+            rows = self._query(f"SELECT {TABLE_COLUMNS} FROM boundary_tables WHERE camera_ip = ?", (camera_ip,))
+            if not rows:
+                return None
+            items = self._query(
+                f"SELECT {ITEM_COLUMNS} FROM boundary_items WHERE camera_ip = ? ORDER BY position", (camera_ip,)
+            )
+        return self._table(camera_ip, rows[0], [self._item(row) for row in items])
+
+    def get_boundary_by_table(self, table_id: str) -> Optional[BoundaryTable]:
+        rows = self._query("SELECT camera_ip FROM boundary_tables WHERE table_id = ?", (table_id,))
+        return self.get_boundary(rows[0][0]) if rows else None
+
+    def save_boundary(self, boundary: BoundaryTable):
+        with self.transaction():
+            self.connection.execute(
+                f"INSERT INTO boundary_tables (camera_ip, {TABLE_COLUMNS}) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (camera_ip) DO UPDATE SET table_id = excluded.table_id, "
+                "frame_width = excluded.frame_width, frame_height = excluded.frame_height, "
+                "homography = excluded.homography",
+                (boundary.camera_ip, boundary.table_id, boundary.frame_width, boundary.frame_height,
+                 json.dumps(boundary.homography) if boundary.homography is not None else None)
+            )
+            self.connection.execute("DELETE FROM boundary_items WHERE camera_ip = ?", (boundary.camera_ip,))
+            self.connection.executemany(
+                f"INSERT INTO boundary_items (camera_ip, position, {ITEM_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (boundary.camera_ip, position, item.boundary_type,
+                     *item.UL_coord.to_tuple(), *item.UR_coord.to_tuple(),
+                     *item.LR_coord.to_tuple(), *item.LL_coord.to_tuple())
+                    for position, item in enumerate(boundary.items)
+                ]
+            )
+            self.boundary_versions.bump(boundary.camera_ip)
+
+    def delete_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        with self.transaction():
+            boundary = self.get_boundary(camera_ip)
+            if boundary:
+                self.connection.execute("DELETE FROM boundary_tables WHERE camera_ip = ?", (camera_ip,))
+                self.boundary_versions.bump(camera_ip)
+            return boundary
+
+    @staticmethod
+    def _table(camera_ip: str, row: tuple, items: List[Boundary]) -> BoundaryTable:
+        table_id, frame_width, frame_height, homography = row
+        return BoundaryTable(
+            table_id=table_id, camera_ip=camera_ip, items=items, frame_width=frame_width, frame_height=frame_height,
+            homography=json.loads(homography) if homography is not None else None
+        )
+
+    @staticmethod
+    def _item(row: tuple) -> Boundary:
+        boundary_type, ul_x, ul_y, ur_x, ur_y, lr_x, lr_y, ll_x, ll_y = row
+        return Boundary(
+            boundary_type=boundary_type,
+            UL_coord=Coordinate(x=ul_x, y=ul_y),
+            UR_coord=Coordinate(x=ur_x, y=ur_y),
+            LR_coord=Coordinate(x=lr_x, y=lr_y),
+            LL_coord=Coordinate(x=ll_x, y=ll_y)
+        )
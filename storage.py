@@ -0,0 +1,102 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, ContextManager
+
+from models import MatchTable, BoundaryTable
+from versions import VersionTracker
+
+# match_versions key covering the whole match table
+MATCH_TABLE = "*"
+
+
+class Storage(ABC):
+    """Persistence interface used by MatchService and BoundaryService.
+
+    Every mutation is durable when the call returns, unless it runs inside
+    `transaction()`, in which case all mutations of the block are committed
+    together on exit and discarded if the block raises.
+
+    `boundary_version` changes whenever a camera's boundary table may have
+    changed, and `match_version` whenever any match may have changed, so
+    derived data can be cached against them.
+    """
+
+    def __init__(self):
+        self.boundary_versions = VersionTracker()
+        self.match_versions = VersionTracker()
+
+    def boundary_version(self, camera_ip: str) -> int:
+        return self.boundary_versions.get(camera_ip)
+
+    def match_version(self) -> int:
+        return self.match_versions.get(MATCH_TABLE)
+
+    def load(self):
+        pass
+
+    def close(self):
+        pass
+
+    def store_size(self) -> int:
+        """Bytes the store takes on disk."""
+        return 0
+
+    def save_snapshot(self):
+        pass
+
+    def needs_compaction(self, max_records: int) -> bool:
+        return False
+
+    def compact(self):
+        pass
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        ...
+
+    # Matches
+
+    @abstractmethod
+    def list_matches(self) -> List[MatchTable]:
+        ...
+
+    @abstractmethod
+    def count_matches(self) -> int:
+        ...
+
+    @abstractmethod
+    def get_match(self, camera_ip: str) -> Optional[MatchTable]:
+        ...
+
+    @abstractmethod
+    def get_match_by_table(self, table_id: str) -> Optional[MatchTable]:
+        ...
+
+    @abstractmethod
+    def save_match(self, match: MatchTable):
+        ...
+
+    @abstractmethod
+    def delete_match(self, camera_ip: str) -> Optional[MatchTable]:
+        ...
+
+    # Boundaries
+
+    @abstractmethod
+    def list_boundaries(self) -> List[BoundaryTable]:
+        ...
+
+    @abstractmethod
+    def get_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        ...
+
+    @abstractmethod
+    def get_boundary_by_table(self, table_id: str) -> Optional[BoundaryTable]:
+        ...
+
+    @abstractmethod
+    def save_boundary(self, boundary: BoundaryTable):
+        ...
+
+    @abstractmethod
+    def delete_boundary(self, camera_ip: str) -> Optional[BoundaryTable]:
+        ...
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Any, Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from services import BoundaryService
+from executor import StorageExecutor
+from zone_maps import ZoneMap
+
+# WebSocket close code for a camera without boundaries
+CLOSE_NOT_FOUND = 4404
+
+
+class ZoneStream:
+    """Classifies per-frame detection batches for one camera over a WebSocket.
+
+    Clients send `{"frame": <id>, "points": [[x, y], ...]}` and receive
+    `{"frame": <id>, "zones": [...], "dropped": <n>}`. Frames are buffered in
+    a small queue; when the client sends faster than results can be sent
+    back, the oldest buffered frame is dropped, since only the latest frames
+    matter for live video. `dropped` is the total dropped so far. A frame
+    that is not JSON text, such as a binary one, closes the connection with 1003.
+    """
+
+    def __init__(self, websocket: WebSocket, boundary_service: BoundaryService, camera_ip: str, queue_size: int,
+                 executor: StorageExecutor):
+        self.websocket = websocket
+        self.boundary_service = boundary_service
+        self.executor = executor
+        self.camera_ip = camera_ip
+        self.frames: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.close_code: Optional[int] = None
+
+    async def run(self):
+        await self.websocket.accept()
+        try:
+            zone_map = await self.executor.run(self.boundary_service.get_zone_map, self.camera_ip)
+        except ValueError as e:
+            await self.websocket.send_json({"detail": str(e)})
+            await self.websocket.close(code=CLOSE_NOT_FOUND)
+            return
+
+        receiver = asyncio.create_task(self._receive())
+        try:
+            while True:
+                message = await self.frames.get()
+                if message is None:
+                    if self.close_code:
+                        await self.websocket.close(code=self.close_code)
+                    break
+                if await self.executor.run(self.boundary_service.boundary_version, self.camera_ip) != zone_map.version:
+                    try:
+                        zone_map = await self.executor.run(self.boundary_service.get_zone_map, self.camera_ip)
+                    except ValueError as e:
+                        await self.websocket.send_json({"detail": str(e)})
+                        await self.websocket.close(code=CLOSE_NOT_FOUND)
+                        break
+                await self.websocket.send_json(self._classify(zone_map, message))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+
+    async def _receive(self):
+        while True:
+            try:
+                message = await self.websocket.receive_json()
+            except (WebSocketDisconnect, RuntimeError):
+                message = None
+            except ValueError:
+                message = {}
+            except Exception:
+                # Frames receive_json cannot read, such as binary ones, end the
+                # stream rather than leave run() waiting for frames forever
+                self.close_code = status.WS_1003_UNSUPPORTED_DATA
+                message = None
+            if self.frames.full():
+                self.frames.get_nowait()
+                self.dropped += 1
+            self.frames.put_nowait(message)
+            if message is None:
+                return
+
+    def _classify(self, zone_map: ZoneMap, message: Any) -> dict:
+        frame = message.get("frame") if isinstance(message, dict) else None
+        points = self._points(message)
+        if points is None:
+            return {"frame": frame, "detail": "Invalid points.", "dropped": self.dropped}
+        return {"frame": frame, "zones": zone_map.lookup(points), "dropped": self.dropped}
+
+    @staticmethod
+    def _points(message: Any) -> Optional[np.ndarray]:
+        if not isinstance(message, dict):
+            return None
+        try:
+            points = np.asarray(message.get("points", []), dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+        if points.size == 0:
+            return points.reshape(0, 2)
+        if points.ndim != 2 or points.shape[1] != 2:
+            return None
+        return points
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from events import EventBroker
+from history import BoundaryHistory
+from homography import HomographyCache
+from journal import Journal
+from models import BulkMatch
+from repository import Repository
+from responses import ResponseCache
+from services import MatchService, BoundaryService, BulkImportError
+from sqlite_storage import SqliteStorage
+from storage import Storage
+from validation_cache import ValidationCache
+from zone_maps import ZoneMapCache
+
+
+def open_storage(backend: str, directory) -> Storage:
+    if backend == "sqlite":
+        storage = SqliteStorage(os.path.join(directory, "boundary.db"))
+    else:
+        journal = Journal(os.path.join(directory, "storage.journal")) if backend == "journal" else None
+        storage = Repository(os.path.join(directory, "match.json"), os.path.join(directory, "boundary.json"),
+                             journal=journal, recheck_interval=0)
+    storage.load()
+    return storage
+
+
+def services(storage: Storage):
+    events = EventBroker(10, 1)
+    responses = ResponseCache(8, 8)
+    match_service = MatchService(storage, events, responses)
+    boundary_service = BoundaryService(storage, ZoneMapCache(64, 48, 1), events, responses, ValidationCache(1),
+                                       BoundaryHistory(0, 1), HomographyCache(1))
+    return match_service, boundary_service, events
+
+
+def record(table_id: str, camera_ip: str) -> BulkMatch:
+    return BulkMatch(table_id=table_id, camera_ip=camera_ip, capacity=2)
+
+
+def contents(storage: Storage):
+    return ([m.model_dump() for m in storage.list_matches()],
+            [b.model_dump() for b in storage.list_boundaries()])
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_failed_import_leaves_the_store_unchanged(tmp_path, backend):
+    storage = open_storage(backend, tmp_path)
+    match_service, boundary_service, events = services(storage)
+    match_service.import_matches([(1, record("T-X", "X"))], boundary_service)
+    before = contents(storage)
+    published = len(events._buffer)
+
+    records = [(1, record("T-A", "A")), (2, record("T-B", "B")), (3, record("T-A", "C")), (4, record("T-D", "X"))]
+    with pytest.raises(BulkImportError) as error:
+        match_service.import_matches(records, boundary_service)
+
+    assert [e["line"] for e in error.value.errors] == [3, 4]
+    assert contents(storage) == before
+    assert storage.get_boundary("A") is None
+    assert len(events._buffer) == published
+    # Nothing was persisted either
+    storage.close()
+    assert contents(open_storage(backend, tmp_path)) == before
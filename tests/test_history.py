@@ -0,0 +1,92 @@
+import os
+from typing import List
+
+from events import EventBroker
+from history import BoundaryHistory
+from homography import HomographyCache
+from journal import Journal
+from models import Boundary, Coordinate, LayoutRequest, Step
+from repository import Repository
+from responses import ResponseCache
+from services import MatchService, BoundaryService
+from validation_cache import ValidationCache
+from zone_maps import ZoneMapCache
+
+CAMERA = "10.0.0.1"
+
+
+def box(boundary_type: str, x0: int, y0: int, x1: int, y1: int) -> Boundary:
+    return Boundary(boundary_type=boundary_type, UL_coord=Coordinate(x=x0, y=y0), UR_coord=Coordinate(x=x1, y=y0),
+                    LR_coord=Coordinate(x=x1, y=y1), LL_coord=Coordinate(x=x0, y=y1))
+
+
+def layout(version: int) -> List[Boundary]:
+    # Every version moves one item, every third one resizes OUTER too
+    return [box("OUTER", 10, 10, 1200 - 10 * (version // 3), 900), box("TABLE", 300, 200, 900, 700),
+            box("1", 100 + version % 2, 100, 280, 400), box("2", 920, 100 + version, 1100, 400)]
+
+
+def test_versions_are_rebuilt_from_keyframes_and_deltas(tmp_path):
+    journal_path = os.path.join(tmp_path, "history.journal")
+    history = BoundaryHistory(20, 3, Journal(journal_path))
+    history.load()
+    recorded = [layout(version) for version in range(1, 9)]
+    # Fewer item types force a keyframe outside the interval
+    recorded.insert(5, recorded[5][:3])
+    for version, items in enumerate(recorded, start=1):
+        history.record("boundaries.updated", CAMERA, "T-1", Step.FINAL, items, (1280, 960 + version))
+
+    summaries = history.versions(CAMERA)
+    assert [summary["version"] for summary in summaries] == list(range(1, 10))
+    assert [summary["keyframe"] for summary in summaries] == [True, False, False, True, False, True, True, False, False]
+    for version, items in enumerate(recorded, start=1):
+        entry, read = history.read(CAMERA, version)
+        assert read == items, f"version {version}"
+        assert entry.frame == (1280, 960 + version)
+
+    # The same versions come back from the journal after a restart
+    history.close()
+    reloaded = BoundaryHistory(20, 3, Journal(journal_path))
+    reloaded.load()
+    assert [reloaded.read(CAMERA, version)[1] for version in range(1, 10)] == recorded
+
+
+def test_oldest_retained_version_stays_readable(tmp_path):
+    history = BoundaryHistory(4, 3)
+    for version in range(1, 11):
+        history.record("boundaries.updated", CAMERA, "T-1", Step.FINAL, layout(version))
+
+    summaries = history.versions(CAMERA)
+    assert [summary["version"] for summary in summaries] == [7, 8, 9, 10]
+    assert summaries[0]["keyframe"]
+    assert [history.read(CAMERA, version)[1] for version in range(7, 11)] == [layout(v) for v in range(7, 11)]
+
+
+def test_rollback_restores_an_earlier_version(tmp_path):
+    storage = Repository(os.path.join(tmp_path, "match.json"), os.path.join(tmp_path, "boundary.json"),
+                         recheck_interval=0)
+    storage.load()
+    events, responses = EventBroker(10, 1), ResponseCache(8, 8)
+    history = BoundaryHistory(10, 2)
+    match_service = MatchService(storage, events, responses)
+    boundary_service = BoundaryService(storage, ZoneMapCache(64, 48, 1), events, responses, ValidationCache(8),
+                                       history, HomographyCache(1))
+    match_service.create_match("T-1", CAMERA, 2, boundary_service)
+    defaults = storage.get_boundary(CAMERA)
+    for version in (2, 3, 4):
+        boundary_service.submit_layout(CAMERA, LayoutRequest(items=layout(version), frame_width=1280,
+                                                             frame_height=960), match_service)
+
+    # Version 2 is stored as a delta on the defaults
+    match, boundary_table = boundary_service.rollback_boundaries(CAMERA, 2, match_service)
+    assert (match.step, boundary_table.items) == (Step.FINAL, layout(2))
+    assert storage.get_boundary(CAMERA).items == layout(2)
+    # The rollback is itself a new version
+    assert history.versions(CAMERA)[-1]["action"] == "boundaries.rolled_back"
+    assert history.read(CAMERA, 5)[1] == layout(2)
+
+    # Back to the defaults the match was created with, and their step and frame
+    match, boundary_table = boundary_service.rollback_boundaries(CAMERA, 1, match_service)
+    assert storage.get_match(CAMERA).step == Step.OUTER
+    assert storage.get_boundary(CAMERA).items == defaults.items
+    assert (boundary_table.frame_width, boundary_table.frame_height) == (defaults.frame_width, defaults.frame_height)
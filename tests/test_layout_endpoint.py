@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from dependencies import get_storage, get_history, get_responses, get_zone_maps, get_validations
+from history import BoundaryHistory
+from models import Step
+from repository import Repository
+from responses import ResponseCache
+from validation_cache import ValidationCache
+from zone_maps import ZoneMapCache
+
+CAMERA = "10.0.0.1"
+
+
+def box(boundary_type: str, x0: int, y0: int, x1: int, y1: int) -> dict:
+    return {"boundary_type": boundary_type, "UL_coord": {"x": x0, "y": y0}, "UR_coord": {"x": x1, "y": y0},
+            "LR_coord": {"x": x1, "y": y1}, "LL_coord": {"x": x0, "y": y1}}
+
+
+LAYOUT = [box("OUTER", 10, 10, 1200, 900), box("TABLE", 300, 200, 900, 700),
+          box("1", 100, 100, 280, 400), box("2", 920, 100, 1100, 400)]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = Repository(os.path.join(tmp_path, "match.json"), os.path.join(tmp_path, "boundary.json"),
+                         recheck_interval=0)
+    storage.load()
+    return storage
+
+
+@pytest.fixture
+def client(storage):
+    # The service singletons stay untouched: storage and history live in tmp_path
+    history = BoundaryHistory(10, 5)
+    responses, zone_maps, validations = ResponseCache(8, 8), ZoneMapCache(64, 48, 1), ValidationCache(8)
+    main.app.dependency_overrides.update({
+        get_storage: lambda: storage, get_history: lambda: history, get_responses: lambda: responses,
+        get_zone_maps: lambda: zone_maps, get_validations: lambda: validations
+    })
+    client = TestClient(main.app)
+    assert client.post("/matches", params={"table_id": "T-1", "camera_ip": CAMERA, "capacity": 2}).json()["success"]
+    yield client
+    main.app.dependency_overrides.clear()
+
+
+def test_submit_layout_saves_it_and_finishes_the_calibration(client, storage):
+    response = client.put(f"/boundaries/{CAMERA}", json={"items": LAYOUT, "frame_width": 1280, "frame_height": 960})
+    body = response.json()
+    assert body["success"], body
+    assert body["data"]["updated_match"]["step"] == "FINAL"
+
+    boundaries = client.get(f"/boundaries/{CAMERA}").json()["data"]
+    assert boundaries["items"] == LAYOUT
+    assert (boundaries["frame_width"], boundaries["frame_height"]) == (1280, 960)
+    assert storage.get_match(CAMERA).step == Step.FINAL
+    versions = client.get(f"/boundaries/{CAMERA}/history").json()["data"]["versions"]
+    assert [version["action"] for version in versions] == ["match.created", "boundaries.submitted"]
+
+
+@pytest.mark.parametrize("items, detail", [
+    (LAYOUT[:3], "Boundaries must be OUTER, TABLE, 1, 2 in this order."),
+    ([LAYOUT[0], box("TABLE", 0, 0, 400, 400), *LAYOUT[2:]], "OUTER boundary intersects with TABLE boundary."),
+    ([*LAYOUT[:3], box("2", 200, 100, 380, 400)], "Boundary 1 intersects with 2 boundary."),
+])
+def test_rejected_layout_leaves_the_boundaries_unchanged(client, storage, items, detail):
+    before = client.get(f"/boundaries/{CAMERA}").json()["data"]
+
+    body = client.put(f"/boundaries/{CAMERA}", json={"items": items}).json()
+    assert (body["success"], body["status_code"]) == (False, 400)
+    assert body["data"]["detail"] == detail
+
+    assert client.get(f"/boundaries/{CAMERA}").json()["data"] == before
+    assert storage.get_match(CAMERA).step == Step.OUTER
+
+
+def test_submit_layout_needs_a_match(client):
+    body = client.put("/boundaries/10.0.0.9", json={"items": LAYOUT}).json()
+    assert (body["success"], body["data"]["detail"]) == (False, "No match found for the given camera IP.")
@@ -0,0 +1,82 @@
+import os
+import stat
+
+from journal import Journal
+from models import MatchTable, Step
+from repository import Repository
+from utils import UMASK
+
+
+def match(camera_ip: str) -> MatchTable:
+    return MatchTable(table_id=f"T-{camera_ip}", camera_ip=camera_ip, step=Step.OUTER, capacity=2)
+
+
+def journal_repository(directory) -> Repository:
+    repository = Repository(os.path.join(directory, "match.json"), os.path.join(directory, "boundary.json"),
+                            journal=Journal(os.path.join(directory, "storage.journal")), recheck_interval=0)
+    repository.load()
+    return repository
+
+
+def queue(repository: Repository, camera_ip: str) -> int:
+    # What _mutate does for another thread before it waits for the flush
+    with repository._lock:
+        repository._apply({"op": "match.put", "record": match(camera_ip).model_dump(mode="json")})
+        return repository._persist([{"op": "match.put", "record": match(camera_ip).model_dump(mode="json")}])
+
+
+def cameras(repository: Repository):
+    return sorted(m.camera_ip for m in repository.list_matches())
+
+
+def test_refresh_keeps_queued_journal_records(tmp_path):
+    repository = journal_repository(tmp_path)
+    repository.save_match(match("A"))
+    version = repository.match_version()
+    repository.refresh(force=True)
+    assert repository.match_version() == version, "own appends must not trigger a reload"
+
+    # Flushed by the journal but not yet seen by the writer's _wait
+    repository.journal.wait(queue(repository, "B"))
+    # Applied in memory and queued, not yet on disk
+    seq = queue(repository, "C")
+
+    repository.refresh(force=True)
+    assert cameras(repository) == ["A", "B", "C"]
+
+    repository._wait(seq)
+    repository.compact()
+    repository.refresh(force=True)
+    assert cameras(repository) == ["A", "B", "C"]
+    repository.close()
+    assert cameras(journal_repository(tmp_path)) == ["A", "B", "C"]
+
+
+def test_refresh_replays_appends_of_other_writers(tmp_path):
+    repository = journal_repository(tmp_path)
+    repository.save_match(match("A"))
+
+    other = Journal(repository.journal.path)
+    other.append([{"op": "match.put", "record": match("B").model_dump(mode="json")}])
+    other.close()
+
+    repository.refresh(force=True)
+    assert cameras(repository) == ["A", "B"]
+    repository.save_match(match("C"))
+    repository.refresh(force=True)
+    assert cameras(repository) == ["A", "B", "C"]
+
+
+def test_saves_keep_the_file_mode(tmp_path):
+    repository = journal_repository(tmp_path)
+    repository.save_match(match("A"))
+    repository.compact()
+    match_file = os.path.join(tmp_path, "match.json")
+    assert stat.S_IMODE(os.stat(match_file).st_mode) == 0o644 & ~UMASK
+
+    os.chmod(match_file, 0o640)
+    repository.save_match(match("B"))
+    repository.compact()
+    assert stat.S_IMODE(os.stat(match_file).st_mode) == 0o640
+    # Compaction rewrote the journal, which open() created
+    assert stat.S_IMODE(os.stat(os.path.join(tmp_path, "storage.journal")).st_mode) == 0o666 & ~UMASK
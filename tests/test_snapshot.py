@@ -0,0 +1,77 @@
+import os
+
+from models import BoundaryTable, Boundary, Coordinate, MatchTable, Step
+from repository import Repository
+from snapshot import Snapshot
+
+
+def item(boundary_type: str, x: int) -> dict:
+    return {
+        "UL_coord": {"x": x, "y": 0}, "UR_coord": {"x": x + 10, "y": 0},
+        "LR_coord": {"x": x + 10, "y": 10}, "LL_coord": {"x": x, "y": -10},
+        "boundary_type": boundary_type
+    }
+
+
+def test_write_and_read_round_trip(tmp_path):
+    matches = [
+        {"table_id": "T-1", "camera_ip": "10.0.0.1", "step": "FINAL", "capacity": 2},
+        {"table_id": "Masa-ş", "camera_ip": "10.0.0.2", "step": "OUTER", "capacity": 6},
+    ]
+    boundaries = [
+        {"table_id": "T-1", "camera_ip": "10.0.0.1", "items": [item("OUTER", 0), item("TABLE", 2 ** 40)],
+         "homography": [[1.0, 0.5, -3.0], [0.0, 1.0, 2.0], [0.0, 1e-4, 1.0]],
+         "frame_width": 1280, "frame_height": 720},
+        # Stored before tables recorded a frame size
+        {"table_id": "Masa-ş", "camera_ip": "10.0.0.2", "items": [], "homography": None},
+    ]
+    metadata = {"signatures": {"match.json": [1, 2]}, "journal_records": 3}
+    snapshot = Snapshot(os.path.join(tmp_path, "storage.snapshot"))
+    snapshot.write(matches, boundaries, metadata)
+
+    assert snapshot.read() == ((matches, boundaries), metadata)
+    # An empty store round-trips too
+    snapshot.write([], [], {})
+    assert snapshot.read() == (([], []), {})
+
+
+def test_unusable_snapshots_read_as_none(tmp_path):
+    path = os.path.join(tmp_path, "storage.snapshot")
+    snapshot = Snapshot(path)
+    assert snapshot.read() is None
+
+    snapshot.write([{"table_id": "T-1", "camera_ip": "A", "step": "OUTER", "capacity": 2}], [], {})
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-8])
+    assert snapshot.read() is None
+    with open(path, "wb") as f:
+        f.write(b"{}" + data[2:])
+    assert snapshot.read() is None
+
+
+def test_repository_starts_from_its_snapshot(tmp_path):
+    def open_repository() -> Repository:
+        repository = Repository(os.path.join(tmp_path, "match.json"), os.path.join(tmp_path, "boundary.json"),
+                                snapshot=Snapshot(os.path.join(tmp_path, "storage.snapshot")), recheck_interval=0)
+        repository.load()
+        return repository
+
+    repository = open_repository()
+    repository.save_match(MatchTable(table_id="T-1", camera_ip="A", step=Step.OUTER, capacity=2))
+    corners = {"UL_coord": Coordinate(x=0, y=0), "UR_coord": Coordinate(x=9, y=0),
+               "LR_coord": Coordinate(x=9, y=9), "LL_coord": Coordinate(x=0, y=9)}
+    repository.save_boundary(BoundaryTable(table_id="T-1", camera_ip="A",
+                                           items=[Boundary(boundary_type="OUTER", **corners)],
+                                           frame_width=1280, frame_height=960))
+    repository.close()
+
+    reopened = open_repository()
+    assert reopened._snapshot_signatures is not None, "loaded from the snapshot"
+    assert reopened.list_matches() == repository.list_matches()
+    assert reopened.get_boundary("A") == repository.get_boundary("A")
+
+    # A change to the JSON files behind the snapshot's back makes it stale
+    reopened.delete_match("A")
+    assert open_repository().list_matches() == []
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from models import BoundaryTable, Boundary, Coordinate, MatchTable, Step
+from sqlite_storage import SqliteStorage
+
+
+def match(camera_ip: str) -> MatchTable:
+    return MatchTable(table_id=f"T-{camera_ip}", camera_ip=camera_ip, step=Step.OUTER, capacity=2)
+
+
+def boundary(camera_ip: str, x: int) -> BoundaryTable:
+    corners = {"UL_coord": Coordinate(x=x, y=0), "UR_coord": Coordinate(x=x + 10, y=0),
+               "LR_coord": Coordinate(x=x + 10, y=10), "LL_coord": Coordinate(x=x, y=10)}
+    return BoundaryTable(table_id=f"T-{camera_ip}", camera_ip=camera_ip,
+                         items=[Boundary(boundary_type="OUTER", **corners)])
+
+
+def sqlite_storage(directory) -> SqliteStorage:
+    storage = SqliteStorage(os.path.join(directory, "boundary.db"))
+    storage.load()
+    return storage
+
+
+def test_failed_transaction_rolls_back(tmp_path):
+    storage = sqlite_storage(tmp_path)
+    storage.save_match(match("A"))
+    storage.save_boundary(boundary("A", 0))
+    versions = storage.match_version(), storage.boundary_version("A")
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.save_match(match("B"))
+            storage.save_boundary(boundary("A", 50))
+            storage.delete_match("A")
+            raise RuntimeError("failed halfway")
+
+    assert [m.camera_ip for m in storage.list_matches()] == ["A"]
+    assert storage.get_boundary("A").items[0].UL_coord.x == 0
+    # Bumped by the writes and again by the rollback, so cached responses are dropped
+    assert storage.match_version() > versions[0]
+    assert storage.boundary_version("A") > versions[1]
+
+    # Nothing reached the file either
+    storage.close()
+    other = sqlite_storage(tmp_path)
+    assert [m.camera_ip for m in other.list_matches()] == ["A"]
+    assert other.get_boundary("A").items[0].UL_coord.x == 0
+
+
+def test_failure_in_a_nested_transaction_rolls_back_the_outer_one(tmp_path):
+    storage = sqlite_storage(tmp_path)
+
+    with pytest.raises(ValueError):
+        with storage.transaction():
+            storage.save_match(match("A"))
+            with storage.transaction():
+                storage.save_match(match("B"))
+                raise ValueError("invalid")
+    assert storage.count_matches() == 0
+
+    # The failed transaction leaves the connection usable
+    with storage.transaction():
+        storage.save_match(match("C"))
+    assert [m.camera_ip for m in storage.list_matches()] == ["C"]
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+from models import BoundaryTable, Boundary, Coordinate
+from repository import Repository
+from geometry import classify_points
+from zone_maps import ZoneMapCache
+
+
+def box(boundary_type: str, x0: int, y0: int, x1: int, y1: int) -> Boundary:
+    return Boundary(boundary_type=boundary_type, UL_coord=Coordinate(x=x0, y=y0), UR_coord=Coordinate(x=x1, y=y0),
+                    LR_coord=Coordinate(x=x1, y=y1), LL_coord=Coordinate(x=x0, y=y1))
+
+
+def repository_with(tmp_path, boundary_table: BoundaryTable) -> Repository:
+    repository = Repository(os.path.join(tmp_path, "match.json"), os.path.join(tmp_path, "boundary.json"),
+                            recheck_interval=0)
+    repository.load()
+    repository.save_boundary(boundary_table)
+    return repository
+
+
+def test_zone_map_covers_the_whole_frame_of_a_larger_table(tmp_path):
+    items = [box("OUTER", 0, 0, 1279, 959), box("TABLE", 400, 300, 880, 660), box("1", 1000, 700, 1200, 900)]
+    repository = repository_with(tmp_path, BoundaryTable(table_id="T-1", camera_ip="A", items=items,
+                                                         frame_width=1280, frame_height=960))
+    zone_map = ZoneMapCache(640, 480, 4).get(repository, "A")
+
+    assert (zone_map.width, zone_map.height) == (640, 480)
+    assert zone_map.headers()["X-Zone-Map-Frame-Width"] == "1280"
+    assert zone_map.headers()["X-Zone-Map-Frame-Height"] == "960"
+    # Seat 1 lands at half its frame coordinates, not cropped off the raster
+    seat = np.argwhere(zone_map.pixels == zone_map.labels.index("1"))
+    assert seat.min(axis=0).tolist() == [350, 500]
+    assert seat.max(axis=0).tolist() == [450, 600]
+    # Lookups take points in the table's frame
+    assert zone_map.lookup([(1100, 800), (640, 480), (100, 100), (1300, 100)]) == ["1", "TABLE", "OUTER", None]
+
+
+def test_classify_points_is_exact_next_to_an_edge():
+    items = [box("OUTER", 10, 10, 600, 400), box("TABLE", 200, 100, 400, 300)]
+    labels = [item.boundary_type for item in items]
+
+    assert classify_points([(9.5, 100), (9.6, 100), (10, 100), (200.4, 150)], items, labels) == \
+        [None, None, "OUTER", "TABLE"]
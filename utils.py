@@ -1,7 +1,35 @@
+import os
 import json
-from typing import List, Dict, Any
+import errno
+import logging
+import stat
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
 from models import Step
+from metrics import STORAGE_LATENCY
 
+logger = logging.getLogger("app")
+# Read once at import, before any threads: os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def keep_mode(fd: int, target: str):
+    """Gives a temp file about to be renamed over `target` the mode of `target`.
+
+    mkstemp creates files as 0600, which os.replace would otherwise carry
+    over; a new target gets 0644 less the umask.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = 0o644 & ~UMASK
+    os.fchmod(fd, mode)
+
+@STORAGE_LATENCY.labels("load_data").time()
 def load_data(file_path: str) -> List[Dict[str, Any]]:
     try:
         with open(file_path, "r") as f:
@@ -9,9 +37,62 @@ def load_data(file_path: str) -> List[Dict[str, Any]]:
     except FileNotFoundError:
         return []
 
+@STORAGE_LATENCY.labels("save_data").time()
 def save_data(file_path: str, data: List[Dict[str, Any]]):
+    # Write to a temp file and rename it over the target so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        keep_mode(fd, file_path)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        return
+    except OSError as e:
+        # A single-file bind mount cannot be renamed over; fall back to
+        # rewriting in place, readers are kept out by FileLock
+        if e.errno not in (errno.EBUSY, errno.EXDEV):
+            raise
+        logger.warning(f"Could not replace {file_path} atomically ({os.strerror(e.errno)}), rewriting it in place; "
+                       "mount its directory instead of the file")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
     with open(file_path, "w") as f:
         json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+class FileLock:
+    """Reentrant lock shared with other processes through flock(2) on `path`.
+
+    Nested `hold` calls from the thread that owns the lock are no-ops, so a
+    shared hold inside an exclusive one keeps the exclusive lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def hold(self, shared: bool = False) -> Iterator[None]:
+        with self._lock:
+            if self._depth == 0:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                    self._fd = None
 
 def get_step_order_for_capacity(capacity: int) -> List[Step]:
     base_steps = [Step.OUTER, Step.TABLE]
@@ -0,0 +1,33 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+Result = Tuple[bool, str]
+
+
+class ValidationCache:
+    """LRU of dry-run validation results.
+
+    Keys include the camera's boundary version, so a write to the camera's
+    boundaries makes its entries unreachable and they age out.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[Hashable, Result]" = OrderedDict()
+
+    def get(self, key: Hashable, build: Callable[[], Result]) -> Result:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result
+
+        result = build()
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+        return result
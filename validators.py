@@ -1,6 +1,7 @@
 
+from enum import Enum
 from math import atan
-from typing import Tuple , List
+from typing import Tuple , List, Sequence, Dict
 from models import Quad
 #import matplotlib.pyplot as plt
 
@@ -186,4 +187,130 @@ class PolygonValidator:
         if not self.check_convex():
             return False, "Polygon is not convex."
 
-        return True, "Polygon is valid."
\ No newline at end of file
+        return True, "Polygon is valid."
+
+
+class Overlap(str, Enum):
+    SEPARATE = "SEPARATE"
+    TOUCHING = "TOUCHING"
+    OVERLAPPING = "OVERLAPPING"
+    CONTAINS = "CONTAINS"
+    CONTAINED = "CONTAINED"
+
+
+class OverlapValidator:
+    """Separating-axis test between two convex quads.
+
+    Unlike IntersectionValidator it also catches one quad lying entirely
+    inside the other, and it stops at the first axis that separates them
+    instead of collecting every edge crossing. CONTAINS / CONTAINED are from
+    quad1's point of view; TOUCHING means the boundaries meet but the
+    interiors do not.
+    """
+
+    def __init__(self, quad1: Quad, quad2: Quad):
+        self.points1 = self.quad_points(quad1)
+        self.points2 = self.quad_points(quad2)
+
+    @staticmethod
+    def quad_points(quad: Quad) -> List[Tuple[int, int]]:
+        return [quad.UL_coord.to_tuple(), quad.UR_coord.to_tuple(), quad.LR_coord.to_tuple(), quad.LL_coord.to_tuple()]
+
+    @staticmethod
+    def _project(points: Sequence[Tuple[int, int]], axis: Tuple[int, int]) -> Tuple[int, int]:
+        values = [x * axis[0] + y * axis[1] for x, y in points]
+        return min(values), max(values)
+
+    @staticmethod
+    def _contains_point(points: Sequence[Tuple[int, int]], point: Tuple[int, int]) -> bool:
+        sign = 0
+        for i in range(len(points)):
+            (x1, y1), (x2, y2) = points[i], points[(i + 1) % len(points)]
+            cross = (x2 - x1) * (point[1] - y1) - (y2 - y1) * (point[0] - x1)
+            if cross != 0:
+                if sign == 0:
+                    sign = cross
+                elif (cross > 0) != (sign > 0):
+                    return False
+        return True
+
+    def classify(self) -> Overlap:
+        return self.classify_points(self.points1, self.points2)
+
+    @classmethod
+    def classify_points(cls, points1: Sequence[Tuple[int, int]], points2: Sequence[Tuple[int, int]]) -> Overlap:
+        touching = False
+        # Bounding boxes first: the x and y axes reject most distant pairs immediately
+        for axis in ((1, 0), (0, 1)):
+            min1, max1 = cls._project(points1, axis)
+            min2, max2 = cls._project(points2, axis)
+            if max1 < min2 or max2 < min1:
+                return Overlap.SEPARATE
+            touching = touching or max1 == min2 or max2 == min1
+
+        for points in (points1, points2):
+            for i in range(len(points)):
+                (x1, y1), (x2, y2) = points[i], points[(i + 1) % len(points)]
+                axis = (y1 - y2, x2 - x1)
+                if axis == (0, 0):
+                    continue
+                min1, max1 = cls._project(points1, axis)
+                min2, max2 = cls._project(points2, axis)
+                if max1 < min2 or max2 < min1:
+                    return Overlap.SEPARATE
+                touching = touching or max1 == min2 or max2 == min1
+
+        if touching:
+            return Overlap.TOUCHING
+        if all(cls._contains_point(points1, point) for point in points2):
+            return Overlap.CONTAINS
+        if all(cls._contains_point(points2, point) for point in points1):
+            return Overlap.CONTAINED
+        return Overlap.OVERLAPPING
+
+
+def _bounded(quad: Quad) -> Tuple[List[Tuple[int, int]], int, int, int, int]:
+    # Corners and bounding box, read straight off the model
+    ul, ur, lr, ll = quad.UL_coord, quad.UR_coord, quad.LR_coord, quad.LL_coord
+    xs, ys = (ul.x, ur.x, lr.x, ll.x), (ul.y, ur.y, lr.y, ll.y)
+    return [(ul.x, ul.y), (ur.x, ur.y), (lr.x, lr.y), (ll.x, ll.y)], min(xs), max(xs), min(ys), max(ys)
+
+
+def _has_area(points: Sequence[Tuple[int, int]]) -> bool:
+    # Collinear quads pass PolygonValidator but enclose nothing
+    return sum(points[i - 1][0] * points[i][1] - points[i][0] * points[i - 1][1] for i in range(4)) != 0
+
+
+def classify_overlaps(pairs: Sequence[Tuple[Quad, Quad]]) -> List[Overlap]:
+    """`OverlapValidator(quad1, quad2).classify()` for each pair of quads that passed PolygonValidator.
+
+    Each quad's corners and bounding box are read once however many pairs
+    it is in. Pairs with disjoint bounding boxes, most of a table's, are
+    SEPARATE straight away, and a pair where one box holds the other tries
+    the containment test before the separating axes: a nested quad with an
+    area can neither be separate from nor touch the one holding it.
+    """
+    bounds: Dict[int, Tuple[List[Tuple[int, int]], int, int, int, int]] = {}
+    contains = OverlapValidator._contains_point
+    overlaps = []
+    for quad1, quad2 in pairs:
+        bounds1 = bounds.get(id(quad1))
+        if bounds1 is None:
+            bounds1 = bounds[id(quad1)] = _bounded(quad1)
+        bounds2 = bounds.get(id(quad2))
+        if bounds2 is None:
+            bounds2 = bounds[id(quad2)] = _bounded(quad2)
+        points1, left1, right1, top1, bottom1 = bounds1
+        points2, left2, right2, top2, bottom2 = bounds2
+
+        if right1 < left2 or right2 < left1 or bottom1 < top2 or bottom2 < top1:
+            overlaps.append(Overlap.SEPARATE)
+        elif (left1 <= left2 and right2 <= right1 and top1 <= top2 and bottom2 <= bottom1 and _has_area(points2)
+              and all(contains(points1, point) for point in points2)):
+            overlaps.append(Overlap.CONTAINS)
+        elif (left2 <= left1 and right1 <= right2 and top2 <= top1 and bottom1 <= bottom2 and _has_area(points1)
+              and all(contains(points2, point) for point in points1)):
+            overlaps.append(Overlap.CONTAINED)
+        else:
+            overlaps.append(OverlapValidator.classify_points(points1, points2))
+    return overlaps
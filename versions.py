@@ -0,0 +1,32 @@
+import threading
+from typing import Dict
+
+
+class VersionTracker:
+    """In-process change counters, one per key.
+
+    Every bump takes the next value of a single counter, so a key's version
+    changes on every mutation and never repeats. `bump_all` is used when a
+    reload may have changed any key without saying which.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._floor = 0
+        self._versions: Dict[str, int] = {}
+
+    def get(self, key: str) -> int:
+        return max(self._versions.get(key, 0), self._floor)
+
+    def bump(self, key: str) -> int:
+        with self._lock:
+            self._counter += 1
+            self._versions[key] = self._counter
+            return self._counter
+
+    def bump_all(self):
+        with self._lock:
+            self._counter += 1
+            self._floor = self._counter
+            self._versions.clear()
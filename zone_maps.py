@@ -0,0 +1,121 @@
+import json
+import zlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Sequence
+
+import numpy as np
+
+from geometry import quads_to_array, rasterize_quads, points_in_convex_quads, innermost_indices
+from scaling import Frame, frame_of
+from storage import Storage
+
+
+def raster_scale(frame: Frame, width: int, height: int) -> np.ndarray:
+    """Raster pixels per frame pixel along x and y."""
+    return np.array([width / frame[0], height / frame[1]])
+
+
+class ZoneMap:
+    """Rasterized boundary table of one camera at a fixed resolution.
+
+    `pixels[y, x]` is an index into `labels`, where label 0 means no zone
+    and label i is the boundary_type of the (i - 1)th boundary item. The
+    raster covers the table's whole `frame`, whose pixels `quads` and the
+    points given to `lookup` are in.
+    """
+
+    def __init__(self, camera_ip: str, version: int, labels: List[Optional[str]], pixels: np.ndarray,
+                 quads: np.ndarray, frame: Frame):
+        self.camera_ip = camera_ip
+        self.version = version
+        self.labels = labels
+        self.pixels = pixels
+        self.quads = quads
+        self.frame = frame
+        self._compressed: Optional[bytes] = None
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    def lookup(self, points: Sequence[Tuple[float, float]]) -> List[Optional[str]]:
+        """Zone of each point, read from the raster pixel it rounds to.
+
+        Approximate within a pixel of an edge; `geometry.classify_points` is exact.
+        """
+        point_array = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        pixel = np.rint(point_array * raster_scale(self.frame, self.width, self.height)).astype(np.intp)
+        in_frame = (pixel[:, 0] >= 0) & (pixel[:, 0] < self.width) & (pixel[:, 1] >= 0) & (pixel[:, 1] < self.height)
+        label_indices = np.zeros(len(point_array), dtype=np.intp)
+        label_indices[in_frame] = self.pixels[pixel[in_frame, 1], pixel[in_frame, 0]]
+        # Points outside the raster fall back to the exact geometry test
+        outside = ~in_frame
+        if outside.any():
+            label_indices[outside] = innermost_indices(points_in_convex_quads(point_array[outside], self.quads)) + 1
+        return np.array(self.labels, dtype=object)[label_indices].tolist()
+
+    def to_bytes(self, compressed: bool = False) -> bytes:
+        if not compressed:
+            return self.pixels.tobytes()
+        if self._compressed is None:
+            self._compressed = zlib.compress(self.pixels.tobytes())
+        return self._compressed
+
+    def headers(self) -> dict:
+        return {
+            "X-Zone-Map-Width": str(self.width),
+            "X-Zone-Map-Height": str(self.height),
+            "X-Zone-Map-Frame-Width": str(self.frame[0]),
+            "X-Zone-Map-Frame-Height": str(self.frame[1]),
+            "X-Zone-Map-Labels": json.dumps(self.labels),
+            "X-Zone-Map-Version": str(self.version),
+        }
+
+
+class ZoneMapCache:
+    """LRU of zone maps, rebuilt when the camera's boundary version changes."""
+
+    def __init__(self, width: int, height: int, max_size: int):
+        self.width = width
+        self.height = height
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._maps: "OrderedDict[str, ZoneMap]" = OrderedDict()
+
+    def get(self, storage: Storage, camera_ip: str) -> Optional[ZoneMap]:
+        version = storage.boundary_version(camera_ip)
+        with self._lock:
+            zone_map = self._maps.get(camera_ip)
+            if zone_map and zone_map.version == version:
+                self._maps.move_to_end(camera_ip)
+                return zone_map
+
+        boundary_table = storage.get_boundary(camera_ip)
+        if not boundary_table:
+            with self._lock:
+                self._maps.pop(camera_ip, None)
+            return None
+
+        quads = quads_to_array(boundary_table.items)
+        frame = frame_of(boundary_table)
+        # The quads are scaled unrounded onto the raster, so it covers the whole frame whatever its size
+        scale = raster_scale(frame, self.width, self.height)
+        zone_map = ZoneMap(
+            camera_ip,
+            version,
+            [None] + [item.boundary_type for item in boundary_table.items],
+            rasterize_quads(quads * scale, self.width, self.height),
+            quads,
+            frame
+        )
+        with self._lock:
+            self._maps[camera_ip] = zone_map
+            self._maps.move_to_end(camera_ip)
+            while len(self._maps) > self.max_size:
+                self._maps.popitem(last=False)
+        return zone_map